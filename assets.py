@@ -0,0 +1,112 @@
+import json
+import os
+import pygame
+from collections import OrderedDict
+
+# Released images that stay cached (least recently used are dropped first)
+MAX_UNUSED_IMAGES = 256
+
+# Packed sprite atlas written by split_sprites.py
+ATLAS_INDEX = os.path.join("sprites", "atlas.json")
+
+def load_image(path):
+    image = pygame.image.load(path)
+    # convert_alpha() needs a display mode, off-screen renderers keep the raw surface
+    if pygame.display.get_init() and pygame.display.get_surface() is not None:
+        return image.convert_alpha()
+    return image
+
+
+class AssetCache:
+    # Process-wide store so every Level / SpriteManager / editor instance shares
+    # one surface per (path, size) instead of loading and scaling its own copy.
+    def __init__(self, max_unused=MAX_UNUSED_IMAGES):
+        self.max_unused = max_unused
+        self.natives = {}
+        self.images = {}
+        self.refs = {}
+        self.unused = OrderedDict()
+        self.tilesets = {}
+        self.atlas = None
+        self.atlas_rects = None
+
+    def load_atlas(self, index_path=ATLAS_INDEX):
+        # One image for every sprite, each file path maps to a rect inside it
+        self.atlas_rects = {}
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        folder = os.path.dirname(index_path)
+        self.atlas = load_image(os.path.join(folder, index["image"]))
+        for key, rect in index["frames"].items():
+            self.atlas_rects[os.path.normpath(os.path.join(folder, key))] = pygame.Rect(rect)
+
+    def has_image(self, path):
+        if self.atlas_rects is None:
+            self.load_atlas()
+        return os.path.normpath(path) in self.atlas_rects or os.path.exists(path)
+
+    def list_images(self, folder, extension=".png"):
+        if self.atlas_rects is None:
+            self.load_atlas()
+        folder = os.path.normpath(folder)
+        paths = [path for path in self.atlas_rects
+                 if os.path.dirname(path) == folder and path.endswith(extension)]
+        if not paths and os.path.exists(folder):
+            paths = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(extension)]
+        return paths
+
+    def image_key(self, path, scale=1, size=None):
+        if size is None:
+            w, h = self.get_native(path).get_size()
+            size = (int(w * scale), int(h * scale))
+        return (path, tuple(size))
+
+    def get_native(self, path):
+        # Unscaled source images are small and stay cached, the scaled copies
+        # made from them are reference counted and evicted when unused
+        native = self.natives.get(path)
+        if native is None:
+            if self.atlas_rects is None:
+                self.load_atlas()
+            rect = self.atlas_rects.get(os.path.normpath(path))
+            native = self.atlas.subsurface(rect) if rect else load_image(path)
+            self.natives[path] = native
+        return native
+
+    def acquire_image(self, path, scale=1, size=None):
+        key = self.image_key(path, scale, size)
+        image = self.images.get(key)
+        if image is None:
+            native = self.get_native(path)
+            image = native if native.get_size() == key[1] else pygame.transform.scale(native, key[1])
+            self.images[key] = image
+            self.refs[key] = 0
+        self.refs[key] += 1
+        self.unused.pop(key, None)
+        return image
+
+    def release_image(self, path, scale=1, size=None):
+        key = self.image_key(path, scale, size)
+        if self.refs.get(key, 0) <= 0:
+            return
+        self.refs[key] -= 1
+        if self.refs[key] == 0:
+            self.unused[key] = True
+            while len(self.unused) > self.max_unused:
+                evicted, _ = self.unused.popitem(last=False)
+                del self.images[evicted]
+                del self.refs[evicted]
+
+    def load_tileset(self, tileset_path):
+        # Parsed once per process, callers must treat it as read-only
+        tileset = self.tilesets.get(tileset_path)
+        if tileset is None:
+            with open(tileset_path, "r") as f:
+                tileset = json.load(f)
+            self.tilesets[tileset_path] = tileset
+        return tileset
+
+
+asset_cache = AssetCache()
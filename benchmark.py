@@ -0,0 +1,181 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import pygame
+from assets import asset_cache
+from controls import RIGHT, JUMP
+from game_env import GameEnv, BASE_WIDTH, BASE_HEIGHT, SKY_COLOR
+from level_loader import Level
+from mario_batch import MarioBatch
+from sprite_manager import SpriteManager
+
+# python benchmark.py [--widths 211 1000 5000 10000] [--output bench.json]
+#   Headless timings of the hot paths, written as JSON so runs on different
+#   commits can be compared.
+
+LEVEL_PATH = os.path.join("levels", "1-1.json")
+TILESET_PATH = "tileset.json"
+DEFAULT_WIDTHS = [211, 1000, 5000, 10000]
+MIN_TIME = 0.5
+
+
+def time_calls(fn, min_time=MIN_TIME):
+    # Calls fn until min_time has passed, returns calls per second
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def write_wide_level(folder, width):
+    # 1-1 repeated until it is width columns wide
+    with open(LEVEL_PATH, "r") as f:
+        data = json.load(f)
+    tiles = [[row[col % data["width"]] for col in range(width)] for row in data["tiles"]]
+    path = os.path.join(folder, f"level_{width}.json")
+    with open(path, "w") as f:
+        json.dump({"width": width, "height": data["height"], "tiles": tiles,
+                   "objects": {"flagpoles": data["objects"]["flagpoles"]}}, f, indent=4)
+    return path
+
+
+def bench_physics(level_path, scale=3):
+    env = GameEnv(level_path, TILESET_PATH, scale=scale)
+    actions = [RIGHT, RIGHT | JUMP]
+    state = {"i": 0}
+
+    def step():
+        i = state["i"] = state["i"] + 1
+        env.step(actions[(i // 20) % 2])
+        if env.is_over():
+            env.reset()
+
+    return time_calls(step)
+
+
+def bench_batched_physics(level_path, scale=3, count=4096):
+    # Agent-steps per second of MarioBatch, every agent on the same level
+    level = Level(level_path, TILESET_PATH, load_images=False)
+    batch = MarioBatch(count, 32 * scale, 0, scale)
+    actions = [RIGHT, RIGHT | JUMP]
+    state = {"i": 0}
+
+    def step():
+        i = state["i"] = state["i"] + 1
+        batch.step(actions[(i // 20) % 2], 1 / 60, level)
+        fell = batch.fell_out(level)
+        if fell.any():
+            batch.reset(fell)
+
+    return time_calls(step) * count
+
+
+def bench_solid_tiles(level, scale=3):
+    return 1000.0 / time_calls(lambda: level.get_solid_tiles(scale))
+
+
+def bench_render(level_path, scale):
+    env = GameEnv(level_path, TILESET_PATH, scale=scale)
+    surface = pygame.Surface((BASE_WIDTH * scale, BASE_HEIGHT * scale))
+    state = {"i": 0}
+
+    def frame():
+        i = state["i"] = state["i"] + 1
+        env.step(RIGHT | JUMP if (i // 20) % 2 else RIGHT)
+        if env.is_over():
+            env.reset()
+        surface.fill(SKY_COLOR)
+        env.level.draw(surface, env.dt, env.camera_x, scale)
+        env.enemies.draw(surface, env.camera_x)
+        env.mario.draw(surface, env.mario_animator, env.camera_x, env.dt)
+
+    env.render(surface)
+    fps = time_calls(frame)
+    env.close()
+    return fps
+
+
+def bench_load(level_path):
+    return 1000.0 / time_calls(lambda: Level(level_path, TILESET_PATH, load_images=False), min_time=0.2)
+
+
+def bench_sprite_manager(scale=3):
+    # cold: fresh asset cache, warm: images already cached by an earlier instance
+    asset_cache.__init__()
+    start = time.perf_counter()
+    sprites = SpriteManager("sprites", scale)
+    cold = (time.perf_counter() - start) * 1000.0
+    warm = 1000.0 / time_calls(lambda: SpriteManager("sprites", scale).close(), min_time=0.2)
+    sprites.close()
+    return {"cold_ms": cold, "warm_ms": warm}
+
+
+def bench_memory(level_path, instances=16):
+    tracemalloc.start()
+    envs = [GameEnv(level_path, TILESET_PATH) for _ in range(instances)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del envs
+    return peak / instances / 1024.0
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless performance benchmarks")
+    parser.add_argument("--widths", type=int, nargs="+", default=DEFAULT_WIDTHS)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "sprite_manager": bench_sprite_manager(),
+        "levels": [],
+    }
+
+    with tempfile.TemporaryDirectory() as folder:
+        for width in args.widths:
+            level_path = LEVEL_PATH if width == 211 else write_wide_level(folder, width)
+            level = Level(level_path, TILESET_PATH, load_images=False)
+            entry = {
+                "width": width,
+                "load_ms": bench_load(level_path),
+                "get_solid_tiles_ms": bench_solid_tiles(level),
+                "physics_steps_per_s": bench_physics(level_path),
+                "batched_agent_steps_per_s": bench_batched_physics(level_path),
+                "render_fps_scale_1": bench_render(level_path, 1),
+                "render_fps_scale_3": bench_render(level_path, 3),
+                "memory_kib_per_env": bench_memory(level_path),
+            }
+            results["levels"].append(entry)
+            print(", ".join(f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}" for k, v in entry.items()))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
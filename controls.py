@@ -0,0 +1,106 @@
+import numpy as np
+import pygame
+
+# Actions are a small bitmask, so agents, replays and the batched physics all
+# drive Mario with plain integers / uint8 arrays. RUN is reserved, Mario does
+# not run yet.
+NOOP = 0
+LEFT, RIGHT, JUMP, RUN = 1, 2, 4, 8
+
+DEFAULT_KEYS = {pygame.K_LEFT: LEFT, pygame.K_RIGHT: RIGHT, pygame.K_z: JUMP, pygame.K_x: RUN}
+# D-pad left / right (mapped as buttons on most pads) and A
+DEFAULT_BUTTONS = {13: LEFT, 14: RIGHT, 0: JUMP}
+AXIS_DEADZONE = 0.5
+
+
+def pack_action(move_left=False, move_right=False, jump_pressed=False, run=False):
+    return (LEFT if move_left else 0) | (RIGHT if move_right else 0) | (JUMP if jump_pressed else 0) | (RUN if run else 0)
+
+
+def unpack_actions(actions):
+    # uint8 action array -> move_left, move_right, jump_pressed bool arrays
+    actions = np.asarray(actions, dtype=np.uint8)
+    return (actions & LEFT) != 0, (actions & RIGHT) != 0, (actions & JUMP) != 0
+
+
+class KeyboardSource:
+    # Held keys are tracked from KEYDOWN / KEYUP events, so poll() is free
+    def __init__(self, keys=None):
+        self.keys = DEFAULT_KEYS if keys is None else keys
+        self.held = NOOP
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            self.held |= self.keys.get(event.key, NOOP)
+        elif event.type == pygame.KEYUP:
+            self.held &= ~self.keys.get(event.key, NOOP)
+
+    def poll(self):
+        return self.held
+
+
+class ControllerSource:
+    # Button / stick state from joystick events instead of calling
+    # get_button() / get_axis() every frame. buttons maps button index -> bits,
+    # the stick on axis (None to ignore it) adds LEFT / RIGHT past the deadzone.
+    def __init__(self, joystick, buttons=None, axis=0, deadzone=AXIS_DEADZONE):
+        self.instance_id = joystick.get_instance_id()
+        self.buttons = DEFAULT_BUTTONS if buttons is None else buttons
+        self.axis = axis if axis is not None and joystick.get_numaxes() > axis else None
+        self.deadzone = deadzone
+        self.held = NOOP
+        self.stick = NOOP
+
+    def handle_event(self, event):
+        if getattr(event, "instance_id", None) != self.instance_id:
+            return
+        if event.type == pygame.JOYBUTTONDOWN:
+            self.held |= self.buttons.get(event.button, NOOP)
+        elif event.type == pygame.JOYBUTTONUP:
+            self.held &= ~self.buttons.get(event.button, NOOP)
+        elif event.type == pygame.JOYAXISMOTION and event.axis == self.axis:
+            if event.value < -self.deadzone:
+                self.stick = LEFT
+            elif event.value > self.deadzone:
+                self.stick = RIGHT
+            else:
+                self.stick = NOOP
+
+    def poll(self):
+        return self.held | self.stick
+
+
+class ScriptedSource:
+    # Plays back a fixed sequence of actions, then NOOP (or loops)
+    def __init__(self, actions, loop=False):
+        self.actions = np.asarray(actions, dtype=np.uint8).tolist()
+        self.loop = loop
+        self.index = 0
+
+    def handle_event(self, event):
+        pass
+
+    def poll(self):
+        if self.index >= len(self.actions):
+            if not self.loop or not self.actions:
+                return NOOP
+            self.index = 0
+        action = self.actions[self.index]
+        self.index += 1
+        return action
+
+
+class CombinedSource:
+    # Several sources at once (keyboard + controller), their bits are OR'd
+    def __init__(self, *sources):
+        self.sources = [source for source in sources if source is not None]
+
+    def handle_event(self, event):
+        for source in self.sources:
+            source.handle_event(event)
+
+    def poll(self):
+        action = NOOP
+        for source in self.sources:
+            action |= source.poll()
+        return action
@@ -0,0 +1,82 @@
+import math
+import pygame
+
+# Scrolling further than this redraws everything instead
+MAX_SCROLL_FRACTION = 0.5
+
+
+class DirtyRenderer:
+    # Keeps the previous frame on surface and only repaints what changed:
+    # the strip scrolled into view, the old sprite rects, animated tiles that
+    # switched frame and tiles changed through Level.set_tile(). render()
+    # returns the rects to pass to pygame.display.update(), or None when the
+    # whole surface changed (first frame, reset, big scroll).
+    def __init__(self, env, surface):
+        self.env = env
+        self.surface = surface
+        self.full_redraw = True
+        self.camera_px = 0
+        self.sprite_rects = []
+        self.frames = {}
+        env.level.track_changed_cells = True
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def render(self, dt):
+        env = self.env
+        level = env.level
+        surface = self.surface
+        width, height = surface.get_size()
+
+        # Tiles sit on integer world pixels and draw() floors their screen
+        # position, so the level image moves by exactly this many pixels
+        camera_px = math.ceil(env.camera_x)
+        shift = camera_px - self.camera_px
+        self.camera_px = camera_px
+
+        if self.full_redraw or shift < 0 or shift > width * MAX_SCROLL_FRACTION:
+            surface.set_clip(None)
+            env.draw_background(surface, dt)
+            self.sprite_rects = env.draw_sprites(surface, dt)
+            self.frames = self.animated_frames(level.visible_animated(env.camera_x, width, env.scale))
+            self.full_redraw = False
+            return None
+
+        # --- 1. Collect what has to be repainted ---
+        dirty = []
+        if shift:
+            surface.scroll(-shift, 0)
+            dirty.append(pygame.Rect(width - shift, 0, shift, height))
+        dirty.extend(rect.move(-shift, 0) for rect in self.sprite_rects)
+
+        level.advance_animation(dt)
+        animated = level.visible_animated(env.camera_x, width, env.scale)
+        frames = self.animated_frames(animated)
+        for tile_id, rect in animated:
+            if frames[tile_id] != self.frames.get(tile_id):
+                dirty.append(rect)
+        self.frames = frames
+
+        size = level.tile_size * env.scale
+        for col, row in level.changed_cells:
+            dirty.append(pygame.Rect(math.floor(col * size - env.camera_x), row * size, size, size))
+        level.changed_cells = []
+
+        # --- 2. Repaint the background under them, then all sprites on top ---
+        screen_rect = surface.get_rect()
+        for rect in dirty:
+            clip = rect.clip(screen_rect)
+            if clip.width and clip.height:
+                surface.set_clip(clip)
+                env.draw_background(surface, 0)
+        surface.set_clip(None)
+        self.sprite_rects = env.draw_sprites(surface, dt)
+
+        if shift:
+            return None
+        return dirty + self.sprite_rects
+
+    def animated_frames(self, animated):
+        level = self.env.level
+        return {tile_id: level.get_animated_frame_index(tile_id) for tile_id, _ in animated}
@@ -0,0 +1,292 @@
+import math
+import os
+import struct
+import numpy as np
+import pygame
+from assets import asset_cache
+
+# Enemy types (shells are stomped koopas)
+GOOMBA, KOOPA, SHELL = range(3)
+ENEMY_TYPES = {"goomba": GOOMBA, "koopa": KOOPA}
+
+# Unscaled constants, multiplied by the level scale like Mario's
+ENEMY_WIDTH = 16
+ENEMY_HEIGHT = 16
+WALK_SPEED = 32
+SHELL_SPEED = 180
+GRAVITY = 800
+TERMINAL_VELOCITY = 400
+STOMP_BOUNCE_HEIGHT = 16
+KICK_GRACE = 0.2
+SQUISH_TIME = 0.5
+
+# Enemies start simulating this far (in px, unscaled) before they scroll on screen
+ACTIVATION_MARGIN = 32
+WALK_FRAME_TIME = 0.15
+
+ENEMY_FOLDER = os.path.join("sprites", "enemies")
+GOOMBA_WALK = ["characters_sprites copy 2.gif", "characters_sprites copy 3.gif"]
+GOOMBA_SQUISHED = "characters_sprites copy.gif"
+KOOPA_WALK = ["characters_sprites copy 5.gif", "characters_sprites copy 6.gif"]
+KOOPA_SHELL = "characters_sprites copy 11.gif"
+
+# next_spawn, walk animation timer, number of enemies
+STATE_HEADER = struct.Struct("<IdI")
+
+
+def normalize_spawns(spawns, default_row):
+    # Spawn entries are [x, type] or [x, type, row], type as a name or an id
+    normalized = []
+    for spawn in spawns:
+        enemy_type = spawn[1]
+        if isinstance(enemy_type, str):
+            enemy_type = ENEMY_TYPES.get(enemy_type)
+            if enemy_type is None:
+                print(f"Warning: Unknown enemy type {spawn[1]!r}")
+                continue
+        row = spawn[2] if len(spawn) > 2 else default_row
+        normalized.append((spawn[0], enemy_type, row))
+    return sorted(normalized)
+
+
+class EnemyManager:
+    # All enemies of a level as structure-of-arrays, updated together with
+    # vectorized NumPy passes. Spawns are sorted by x so activation is a
+    # pointer walk as the camera scrolls right.
+    def __init__(self, level, scale):
+        self.level = level
+        self.scale = scale
+        self.tile = level.tile_size * scale
+
+        spawns = normalize_spawns(level.enemies, level.height - 3)
+        self.spawn_x = np.array([col * self.tile for col, _, _ in spawns], dtype=np.float64)
+        self.spawn_y = np.array([row * self.tile for _, _, row in spawns], dtype=np.float64)
+        self.spawn_type = np.array([enemy_type for _, enemy_type, _ in spawns], dtype=np.uint8)
+        self.spawn_lefts = self.spawn_x.tolist()
+
+        self.width = ENEMY_WIDTH * scale
+        self.height = ENEMY_HEIGHT * scale
+        self.gravity = GRAVITY * scale
+        self.terminal_velocity = TERMINAL_VELOCITY * scale
+        self.stomp_velocity = -math.sqrt(2 * self.gravity * STOMP_BOUNCE_HEIGHT * scale)
+        # Offsets of the hitbox's top/bottom rows and left/right columns, as
+        # a column so one floor division gives both edges of every enemy
+        self.row_edges = np.array([[0], [self.height - 1]], dtype=np.float64)
+        self.col_edges = np.array([[0], [self.width - 1]], dtype=np.float64)
+        self.frames = {}
+        self.reset()
+
+    def reset(self):
+        count = len(self.spawn_x)
+        self.x = self.spawn_x.copy()
+        self.y = self.spawn_y.copy()
+        self.vx = np.full(count, -WALK_SPEED * self.scale, dtype=np.float64)
+        self.vy = np.zeros(count, dtype=np.float64)
+        self.type = self.spawn_type.copy()
+        self.alive = np.ones(count, dtype=bool)
+        self.active = np.zeros(count, dtype=bool)
+        # kick grace for shells, squish display time for stomped goombas
+        self.timer = np.zeros(count, dtype=np.float64)
+
+        self.next_spawn = 0
+        self.anim_timer = 0.0
+        self.refresh()
+
+    def refresh(self):
+        # Indices of the enemies being simulated and whether any timer runs,
+        # kept up to date so idle ticks skip the array work
+        self.live = np.flatnonzero(self.active & self.alive)
+        self.timing = bool(self.timer.any())
+
+    def activate(self, camera_x, view_width):
+        limit = camera_x + view_width + ACTIVATION_MARGIN * self.scale
+        spawn_lefts = self.spawn_lefts
+        first = self.next_spawn
+        while self.next_spawn < len(spawn_lefts) and spawn_lefts[self.next_spawn] < limit:
+            self.next_spawn += 1
+        if self.next_spawn > first:
+            self.active[first:self.next_spawn] = True
+            self.live = np.flatnonzero(self.active & self.alive)
+
+    def solid_at(self, rows, cols):
+        # Out-of-level (or not streamed in) cells are never solid
+        level = self.level
+        cols = cols - level.col_offset
+        grid_width = level.grid.shape[1]
+        inside = ((rows >= 0) & (rows < level.height) & (cols >= 0) &
+                  (cols < min(level.width - level.col_offset, grid_width)))
+        return inside & level.solid.take(np.where(inside, rows * grid_width + cols, 0))
+
+    def update(self, dt, camera_x, view_width, mario):
+        # Returns True when mario ran into an enemy
+        self.anim_timer += dt
+        if not len(self.x):
+            return False
+        if self.timing:
+            np.maximum(self.timer - dt, 0.0, out=self.timer)
+            self.timing = bool(self.timer.any())
+        self.activate(camera_x, view_width)
+
+        idx = self.live
+        if not len(idx):
+            return False
+        size = self.tile
+        w, h = self.width, self.height
+
+        # --- Walk and bounce off walls ---
+        vx = self.vx[idx]
+        y = self.y[idx]
+        x = self.x[idx] + vx * dt
+        rows = ((y + self.row_edges) // size).astype(np.int64)
+        moving_right = vx > 0
+        edge_col = (np.where(moving_right, x + w - 1, x) // size).astype(np.int64)
+        hit = self.solid_at(rows, edge_col).any(axis=0)
+        if hit.any():
+            x = np.where(hit & moving_right, edge_col * size - w, x)
+            x = np.where(hit & ~moving_right, (edge_col + 1) * size, x)
+            vx = np.where(hit, -vx, vx)
+
+        # --- Gravity and landing ---
+        vy = np.minimum(self.vy[idx] + self.gravity * dt, self.terminal_velocity)
+        y = y + vy * dt
+        bottom_row = ((y + h - 1) // size).astype(np.int64)
+        cols = ((x + self.col_edges) // size).astype(np.int64)
+        landed = (vy > 0) & self.solid_at(bottom_row, cols).any(axis=0)
+        if landed.any():
+            y = np.where(landed, bottom_row * size - h, y)
+            vy = np.where(landed, 0.0, vy)
+
+        self.x[idx] = x
+        self.y[idx] = y
+        self.vx[idx] = vx
+        self.vy[idx] = vy
+
+        # Fell out of the level or left far behind the camera
+        gone = (y > self.level.height * size) | (x + w < camera_x - ACTIVATION_MARGIN * self.scale)
+        if gone.any():
+            self.alive[idx[gone]] = False
+            idx = self.live = idx[~gone]
+
+        return self.resolve_mario(idx, mario, dt)
+
+    def resolve_mario(self, idx, mario, dt):
+        mario_rect = mario.rect()
+        ex = self.x[idx]
+        ey = self.y[idx]
+        touching = ((ex < mario_rect.right) & (ex + self.width > mario_rect.left) &
+                    (ey < mario_rect.bottom) & (ey + self.height > mario_rect.top))
+        if not touching.any():
+            return False
+
+        # A stomp is mario coming down onto the upper half of the enemy
+        previous_bottom = mario_rect.bottom - mario.velocity_y * dt
+        stomped = touching & (mario.velocity_y > 0) & (previous_bottom <= ey + self.height / 2)
+        if stomped.any():
+            hit = idx[stomped]
+            kind = self.type[hit]
+            goombas = hit[kind == GOOMBA]
+            self.alive[goombas] = False
+            self.timer[goombas] = SQUISH_TIME
+            # koopas turn into shells, moving shells stop
+            shells = hit[kind != GOOMBA]
+            self.type[shells] = SHELL
+            self.vx[shells] = 0.0
+            self.timer[shells] = KICK_GRACE
+            self.live = np.flatnonzero(self.active & self.alive)
+            self.timing = True
+            mario.velocity_y = self.stomp_velocity
+            mario.on_ground = False
+            return False
+
+        hit = idx[touching]
+        resting_shell = (self.type[hit] == SHELL) & (self.vx[hit] == 0)
+        kicked = hit[resting_shell]
+        if len(kicked):
+            away = np.sign(self.x[kicked] + self.width / 2 - mario_rect.centerx)
+            away[away == 0] = 1
+            self.vx[kicked] = away * SHELL_SPEED * self.scale
+            self.timer[kicked] = KICK_GRACE
+            self.timing = True
+
+        dangerous = hit[~resting_shell]
+        return bool((self.timer[dangerous] == 0).any())
+
+    def mark_cells(self, tiles, first_col, value):
+        # Writes value into an observation window at every alive enemy's cell
+        idx = self.live
+        if not len(idx):
+            return tiles
+        rows = ((self.y[idx] + self.height / 2) // self.tile).astype(np.int64)
+        cols = ((self.x[idx] + self.width / 2) // self.tile).astype(np.int64) - first_col
+        inside = (rows >= 0) & (rows < tiles.shape[0]) & (cols >= 0) & (cols < tiles.shape[1])
+        tiles[rows[inside], cols[inside]] = value
+        return tiles
+
+    def get_state(self):
+        header = STATE_HEADER.pack(self.next_spawn, self.anim_timer, len(self.x))
+        return header + b"".join(array.tobytes() for array in self.state_arrays())
+
+    def set_state(self, state):
+        self.next_spawn, self.anim_timer, count = STATE_HEADER.unpack_from(state)
+        offset = STATE_HEADER.size
+        for array in self.state_arrays():
+            array[:] = np.frombuffer(state, dtype=array.dtype, count=count, offset=offset)
+            offset += array.nbytes
+        self.refresh()
+
+    def state_arrays(self):
+        return (self.x, self.y, self.vx, self.vy, self.timer, self.type, self.alive, self.active)
+
+    def get_frames(self, scale):
+        frames = self.frames.get(scale)
+        if frames is None:
+            def load(name):
+                return asset_cache.acquire_image(os.path.join(ENEMY_FOLDER, name), scale)
+
+            goomba = [load(os.path.join("goomba", name)) for name in GOOMBA_WALK]
+            koopa_left = [load(os.path.join("koopa_walk", name)) for name in KOOPA_WALK]
+            frames = {
+                "goomba": goomba,
+                "squished": load(os.path.join("goomba", GOOMBA_SQUISHED)),
+                "koopa left": koopa_left,
+                "koopa right": [pygame.transform.flip(image, True, False) for image in koopa_left],
+                "shell": load(os.path.join("koopa_walk", KOOPA_SHELL)),
+            }
+            self.frames[scale] = frames
+        return frames
+
+    def close(self):
+        for scale, frames in self.frames.items():
+            for name in GOOMBA_WALK + [GOOMBA_SQUISHED]:
+                asset_cache.release_image(os.path.join(ENEMY_FOLDER, "goomba", name), scale)
+            for name in KOOPA_WALK + [KOOPA_SHELL]:
+                asset_cache.release_image(os.path.join(ENEMY_FOLDER, "koopa_walk", name), scale)
+        self.frames = {}
+
+    def draw(self, surface, camera_x, scale=None):
+        # scale/camera_x work like Mario.draw, for off-screen renderers
+        if scale is None:
+            scale = self.scale
+        ratio = scale / self.scale
+        frames = self.get_frames(scale)
+        walk_frame = int(self.anim_timer / WALK_FRAME_TIME) % 2
+
+        visible = self.active & (self.alive | (self.timer > 0))
+        view_left = camera_x / ratio - self.width
+        view_right = (camera_x + surface.get_width()) / ratio
+        visible &= (self.x > view_left) & (self.x < view_right)
+
+        rects = []
+        for i in np.flatnonzero(visible).tolist():
+            kind = self.type[i]
+            if kind == GOOMBA:
+                image = frames["goomba"][walk_frame] if self.alive[i] else frames["squished"]
+            elif kind == KOOPA:
+                image = frames["koopa right" if self.vx[i] > 0 else "koopa left"][walk_frame]
+            else:
+                image = frames["shell"]
+            # bottom-aligned with the hitbox, koopas are taller than they collide
+            draw_x = int(self.x[i] * ratio - camera_x)
+            draw_y = int((self.y[i] + self.height) * ratio) - image.get_height()
+            rects.append(surface.blit(image, (draw_x, draw_y)))
+        return rects
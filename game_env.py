@@ -0,0 +1,147 @@
+import pygame
+import struct
+from enemies import EnemyManager
+from level_loader import Level
+from level_stream import StreamingLevel
+from mario import Mario
+from profiler import NULL_PROFILER
+from sprite_manager import SpriteManager, Animator
+
+BASE_WIDTH, BASE_HEIGHT = 256, 240
+SKY_COLOR = (92, 148, 252)
+FIXED_DT = 1 / 60
+
+# camera_x, frame, dead, size of the mario blob, size of the enemies blob
+STATE_HEADER = struct.Struct("<dQ?II")
+
+class GameEnv:
+    # Simulation core shared by main.py and the training code. step() never
+    # opens a display, throttles on a clock or plays audio, render() is optional.
+    def __init__(self, level_path="levels/1-1.json", tileset_path="tileset.json",
+                 scale=1, dt=FIXED_DT, frame_skip=1, start_x=32, start_y=0, stream=False):
+        self.level_path = level_path
+        self.tileset_path = tileset_path
+        self.scale = scale
+        self.dt = dt
+        self.frame_skip = frame_skip
+        self.start_x = start_x
+        self.start_y = start_y
+
+        self.screen_width = BASE_WIDTH * scale
+        self.screen_height = BASE_HEIGHT * scale
+
+        # A generator callable (or stream=True) streams the level in chunks around the camera
+        if stream or callable(level_path):
+            self.level = StreamingLevel(level_path, tileset_path, load_images=False)
+        else:
+            self.level = Level(level_path, tileset_path, load_images=False)
+        self.enemies = EnemyManager(self.level, scale)
+        self.sprites = None
+        self.mario_animator = None
+        self.render_surface = None
+        self.profiler = NULL_PROFILER
+        # replay.ReplayRecorder, logs every tick's action when set
+        self.recorder = None
+        self.reset()
+
+    def reset(self):
+        self.mario = Mario(x=self.start_x * self.scale, y=self.start_y * self.scale, scale=self.scale)
+        self.level.reset()
+        self.enemies.reset()
+        self.camera_x = 0
+        self.frame = 0
+        self.dead = False
+        if self.recorder is not None:
+            self.recorder.start_episode(self)
+
+    def step(self, action):
+        # action is a controls bitmask (LEFT | RIGHT | JUMP), held for frame_skip ticks
+        mario = self.mario
+        recorder = self.recorder
+        for _ in range(self.frame_skip):
+            mario.apply_action(action)
+            if recorder is not None:
+                recorder.record(action)
+            self.update(self.dt)
+            if self.is_over():
+                break
+
+    def update(self, dt):
+        self.mario.update(dt, self.camera_x, self.level)
+        self.profiler.mark("update")
+        if self.enemies.update(dt, self.camera_x, self.screen_width, self.mario):
+            self.dead = True
+        self.profiler.mark("enemies")
+        self.update_camera()
+        self.profiler.mark("camera")
+        self.frame += 1
+
+    def update_camera(self):
+        if self.mario.x - self.camera_x > self.screen_width // 2:
+            self.camera_x = self.mario.x - self.screen_width // 2
+            level_pixel_width = self.level.width * self.level.tile_size * self.scale
+            if self.camera_x > level_pixel_width - self.screen_width:
+                self.camera_x = level_pixel_width - self.screen_width
+            self.level.scroll_to(self.camera_x, self.scale)
+
+    def triggers(self):
+        # Trigger volumes (level_objects.TRIGGER_*) mario is in
+        mario = self.mario
+        return self.level.objects.triggered(mario.x, mario.x + mario.width * self.scale, mario.y, self.scale)
+
+    def is_over(self):
+        return self.dead or bool(self.triggers())
+
+    def get_state(self):
+        mario_state = self.mario.get_state()
+        enemies_state = self.enemies.get_state()
+        header = STATE_HEADER.pack(self.camera_x, self.frame, self.dead, len(mario_state), len(enemies_state))
+        return header + mario_state + enemies_state + self.level.get_state()
+
+    def set_state(self, state):
+        self.camera_x, self.frame, self.dead, mario_size, enemies_size = STATE_HEADER.unpack_from(state)
+        offset = STATE_HEADER.size
+        self.mario.set_state(state[offset:offset + mario_size])
+        offset += mario_size
+        self.enemies.set_state(state[offset:offset + enemies_size])
+        self.level.set_state(state[offset + enemies_size:])
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        self.level.close()
+        self.enemies.close()
+        if self.sprites is not None:
+            self.sprites.close()
+            self.sprites = None
+            self.mario_animator = None
+
+    def render(self, surface=None, dt=None):
+        if surface is None:
+            if self.render_surface is None:
+                self.render_surface = pygame.Surface((self.screen_width, self.screen_height))
+            surface = self.render_surface
+        if dt is None:
+            dt = self.dt
+
+        self.draw_background(surface, dt)
+        self.draw_sprites(surface, dt)
+        return surface
+
+    def draw_background(self, surface, dt):
+        # Sky and level, honours surface's clip rect
+        surface.fill(SKY_COLOR)
+        self.profiler.mark("clear")
+        self.level.draw(surface, dt, self.camera_x, self.scale)
+        self.profiler.mark("level_draw")
+
+    def draw_sprites(self, surface, dt):
+        # Returns the screen rects the enemies and mario were drawn to
+        if self.sprites is None:
+            self.sprites = SpriteManager("sprites", self.scale)
+            self.mario_animator = Animator(self.sprites)
+        rects = self.enemies.draw(surface, self.camera_x)
+        self.profiler.mark("enemy_draw")
+        rects.append(self.mario.draw(surface, self.mario_animator, self.camera_x, dt))
+        self.profiler.mark("mario_draw")
+        return rects
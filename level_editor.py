@@ -2,6 +2,12 @@ import pygame
 import random
 import json
 import os
+import argparse
+import threading
+from collections import OrderedDict, deque
+from assets import asset_cache
+from level_loader import CHUNK_COLUMNS
+from level_objects import ObjectLayer, FLAGPOLE_ID
 
 pygame.init()
 
@@ -17,6 +23,23 @@ LEVEL_PATH = os.path.join("levels", "1-1.json")
 FLOOR_TILE_ID = 4
 DOUBLE_TAP_TIME = 300 
 
+BACKGROUND_COLOR = (30, 30, 30)
+GRID_COLOR = (60, 60, 60)
+CAMERA_SPEED = 10
+FAST_CAMERA_SPEED = 80  # with shift held, for long levels
+# Composited tiles + grid lines, CHUNK_COLUMNS wide, a few screens' worth
+MAX_CACHED_CHUNKS = 16
+MAX_UNDO = 200
+AUTOSAVE_INTERVAL = 30000  # ms, only when something changed
+
+# python level_editor.py [level.json] [--width 5000]
+parser = argparse.ArgumentParser(description="Level editor")
+parser.add_argument("level", nargs="?", default=LEVEL_PATH)
+parser.add_argument("--width", type=int, default=GRID_WIDTH, help="columns for a new level (or to widen one)")
+args = parser.parse_args()
+LEVEL_PATH = args.level
+AUTOSAVE_PATH = os.path.splitext(LEVEL_PATH)[0] + ".autosave.json"
+
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Level Editor - Z/X/V/B/N/M for Brushes")
 
@@ -24,7 +47,8 @@ clock = pygame.time.Clock()
 FONT = pygame.font.SysFont(None, 24)
 
 # --- Object & Brush Data ---
-flagpoles = [] 
+objects = ObjectLayer()  # flagpoles and props, sorted by column
+enemies = []  # enemy spawns aren't editable yet, but are kept on save
 current_tile_id = FLOOR_TILE_ID
 current_object_id = None  # When this is set, we are in "Object Mode"
 
@@ -38,30 +62,38 @@ camera_x = 0
 
 # --- Load tileset ---
 tile_images = {}
+tile_image_paths = []
 try:
-    with open("tileset.json", "r") as f:
-        tileset = json.load(f)
+    tileset = asset_cache.load_tileset("tileset.json")
     tiles = tileset["tiles"]
     for tile_id, tile_data in tiles.items():
         frames = tile_data["frames"]
         if frames:
             image_path = os.path.join("sprites", "tiles", frames[0])
-            if os.path.exists(image_path):
-                image = pygame.image.load(image_path).convert_alpha()
-                tile_images[int(tile_id)] = image
+            # Through the shared cache, like Level: tiles may only exist in the sprite atlas
+            if asset_cache.has_image(image_path):
+                tile_images[int(tile_id)] = asset_cache.acquire_image(image_path)
+                tile_image_paths.append(image_path)
+            else:
+                print(f"Warning: Missing tile image {image_path}")
 except FileNotFoundError:
     print("Warning: tileset.json not found.")
 
 # --- Load or create level ---
-level = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-
+loaded_tiles = None
 if os.path.exists(LEVEL_PATH):
     with open(LEVEL_PATH, "r") as f:
         data = json.load(f)
         loaded_tiles = data["tiles"] if isinstance(data, dict) and "tiles" in data else data
         if isinstance(data, dict):
-            flagpoles = data.get("objects", {}).get("flagpoles", [])
-    
+            objects = ObjectLayer(data.get("objects", {}).get("flagpoles", []))
+            enemies = data.get("objects", {}).get("enemies", [])
+
+# Levels wider than --width keep all their columns
+GRID_WIDTH = max([args.width] + [len(row) for row in loaded_tiles or []])
+level = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+
+if loaded_tiles is not None:
     for y in range(min(GRID_HEIGHT, len(loaded_tiles))):
         for x in range(min(GRID_WIDTH, len(loaded_tiles[y]))):
             level[y][x] = loaded_tiles[y][x]
@@ -70,6 +102,154 @@ else:
         for col in range(GRID_WIDTH):
             level[row][col] = FLOOR_TILE_ID
 
+# --- Cached tile layer ---
+# Tiles and grid lines are composited into CHUNK_COLUMNS wide surfaces once,
+# edits only repaint their cell, so a frame is a handful of blits however
+# wide the level is.
+chunks = OrderedDict()
+
+
+def draw_cell(surf, x, y, local_x):
+    cell = pygame.Rect(local_x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+    surf.set_clip(cell)
+    surf.fill(BACKGROUND_COLOR, cell)
+    image = tile_images.get(level[y][x])
+    if image:
+        surf.blit(image, cell.topleft)
+    # Every cell owns the grid lines on its left and top edge
+    pygame.draw.line(surf, GRID_COLOR, cell.topleft, cell.bottomleft)
+    pygame.draw.line(surf, GRID_COLOR, cell.topleft, cell.topright)
+    surf.set_clip(None)
+
+
+def get_chunk(chunk):
+    surf = chunks.get(chunk)
+    if surf is not None:
+        chunks.move_to_end(chunk)
+        return surf
+
+    first_col = chunk * CHUNK_COLUMNS
+    columns = min(CHUNK_COLUMNS, GRID_WIDTH - first_col)
+    surf = pygame.Surface((columns * TILE_SIZE, SCREEN_HEIGHT))
+    surf.fill(BACKGROUND_COLOR)
+    for y in range(GRID_HEIGHT):
+        row = level[y]
+        for local_x in range(columns):
+            image = tile_images.get(row[first_col + local_x])
+            if image:
+                surf.blit(image, (local_x * TILE_SIZE, y * TILE_SIZE))
+    for local_x in range(columns):
+        pygame.draw.line(surf, GRID_COLOR, (local_x * TILE_SIZE, 0), (local_x * TILE_SIZE, SCREEN_HEIGHT))
+    for y in range(0, SCREEN_HEIGHT, TILE_SIZE):
+        pygame.draw.line(surf, GRID_COLOR, (0, y), (surf.get_width(), y))
+
+    chunks[chunk] = surf
+    if len(chunks) > MAX_CACHED_CHUNKS:
+        chunks.popitem(last=False)
+    return surf
+
+
+def redraw_cell(x, y):
+    surf = chunks.get(x // CHUNK_COLUMNS)
+    if surf is not None:
+        draw_cell(surf, x, y, x % CHUNK_COLUMNS)
+
+
+# --- Undo Journal ---
+# One entry per mouse stroke (or level clear): [(x, y, old_id, new_id), ...]
+undo_stack = deque(maxlen=MAX_UNDO)
+redo_stack = []
+stroke = {}  # (x, y) -> [old_id, new_id] of the stroke in progress
+edit_count = 0  # bumped on every change, autosave compares against it
+
+
+def set_cell(x, y, tile_id):
+    global edit_count
+    old_id = level[y][x]
+    if old_id == tile_id:
+        return
+    if (x, y) in stroke:
+        stroke[(x, y)][1] = tile_id
+    else:
+        stroke[(x, y)] = [old_id, tile_id]
+    level[y][x] = tile_id
+    redraw_cell(x, y)
+    edit_count += 1
+
+
+def end_stroke():
+    if stroke:
+        undo_stack.append([(x, y, old_id, new_id) for (x, y), (old_id, new_id) in stroke.items() if old_id != new_id])
+        redo_stack.clear()
+        stroke.clear()
+
+
+def apply_diffs(diffs, undo):
+    global edit_count
+    for x, y, old_id, new_id in diffs:
+        level[y][x] = old_id if undo else new_id
+        redraw_cell(x, y)
+    edit_count += 1
+
+
+def undo():
+    end_stroke()
+    if undo_stack:
+        diffs = undo_stack.pop()
+        apply_diffs(diffs, True)
+        redo_stack.append(diffs)
+
+
+def redo():
+    if redo_stack:
+        diffs = redo_stack.pop()
+        apply_diffs(diffs, False)
+        undo_stack.append(diffs)
+
+
+# --- Background Save ---
+# The level is copied on the UI thread (a few ms even for 5000+ columns),
+# encoding and writing happen on a worker so the editor keeps its frame rate.
+save_thread = None
+save_requested = False
+autosaved_count = 0
+last_autosave = 0
+
+
+def write_level(path, data, message):
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+        print(message)
+    except OSError as e:
+        print(f"Warning: could not save {path}: {e}")
+
+
+def start_save(path, message):
+    # False while the previous save is still being written
+    global save_thread
+    if save_thread is not None and save_thread.is_alive():
+        return False
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {
+        "width": GRID_WIDTH,
+        "height": GRID_HEIGHT,
+        "tiles": [row[:] for row in level],
+        "objects": {"flagpoles": objects.to_list(),
+                    "enemies": list(enemies)}
+    }
+    save_thread = threading.Thread(target=write_level, args=(path, data, message))
+    save_thread.start()
+    return True
+
+
+ui_text = None
+ui_surface = None
+
 running = True
 while running:
     clock.tick(60)
@@ -85,9 +265,9 @@ while running:
                     now = pygame.time.get_ticks()
                     if now - last_f_press <= DOUBLE_TAP_TIME:
                         center_tile_x = (camera_x + SCREEN_WIDTH // 2) // TILE_SIZE
-                        if flagpoles:
-                            closest = min(flagpoles, key=lambda obj: abs((obj[0] if isinstance(obj, list) else obj) - center_tile_x))
-                            flagpoles.remove(closest)
+                        closest = objects.nearest(center_tile_x)
+                        if closest >= 0:
+                            objects.remove(closest)
                         input_active = False
                         input_text = ""
                         last_f_press = now
@@ -98,7 +278,7 @@ while running:
                     if input_text.isdigit():
                         fx = int(input_text)
                         if 0 <= fx < GRID_WIDTH:
-                            flagpoles.append([fx, 10])
+                            objects.add(fx, FLAGPOLE_ID)
                     input_active = False
                     input_text = ""
                 elif event.key == pygame.K_BACKSPACE:
@@ -109,7 +289,16 @@ while running:
                     input_text += event.unicode
             continue 
 
-        if event.type == pygame.KEYDOWN:
+        if event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+            # --- Undo / Redo (Ctrl+Z, Ctrl+Y or Ctrl+Shift+Z) ---
+            if event.key == pygame.K_z and event.mod & pygame.KMOD_SHIFT:
+                redo()
+            elif event.key == pygame.K_z:
+                undo()
+            elif event.key == pygame.K_y:
+                redo()
+
+        elif event.type == pygame.KEYDOWN:
             # --- ZXVBNM Mapping (Switches to Object Brush) ---
             # --- ZXVBNM Mapping + Hills (Switches to Object Brush) ---
             prop_map = {
@@ -134,31 +323,38 @@ while running:
                 last_f_press = now
 
             elif event.key == pygame.K_s:
-                os.makedirs("levels", exist_ok=True)
-                with open(LEVEL_PATH, "w") as f:
-                    json.dump({
-                        "width": GRID_WIDTH,
-                        "height": GRID_HEIGHT,
-                        "tiles": level,
-                        "objects": {"flagpoles": flagpoles}
-                    }, f, indent=4)
-                print("Level saved.")
+                save_requested = True
 
             elif event.key == pygame.K_c:
                 now = pygame.time.get_ticks()
                 if now - last_c_press <= DOUBLE_TAP_TIME:
-                    level = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-                    flagpoles = []
-                    for row in range(GRID_HEIGHT - 2, GRID_HEIGHT):
+                    # Clears everything: tiles as one undoable stroke, then
+                    # objects and enemy spawns (undo only restores tiles)
+                    end_stroke()
+                    objects = ObjectLayer()
+                    enemies = []
+                    for row in range(GRID_HEIGHT):
                         for col in range(GRID_WIDTH):
-                            level[row][col] = FLOOR_TILE_ID
+                            set_cell(col, row, FLOOR_TILE_ID if row >= GRID_HEIGHT - 2 else 0)
+                    end_stroke()
                 last_c_press = now
 
+    # --- Saving ---
+    if save_requested and start_save(LEVEL_PATH, "Level saved."):
+        save_requested = False
+        autosaved_count = edit_count
+    now = pygame.time.get_ticks()
+    if edit_count != autosaved_count and now - last_autosave >= AUTOSAVE_INTERVAL:
+        if start_save(AUTOSAVE_PATH, f"Autosaved to {AUTOSAVE_PATH}."):
+            autosaved_count = edit_count
+            last_autosave = now
+
     # --- Camera ---
     keys = pygame.key.get_pressed()
     if not input_active:
-        if keys[pygame.K_RIGHT]: camera_x += 10
-        if keys[pygame.K_LEFT]: camera_x -= 10
+        speed = FAST_CAMERA_SPEED if keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT] else CAMERA_SPEED
+        if keys[pygame.K_RIGHT]: camera_x += speed
+        if keys[pygame.K_LEFT]: camera_x -= speed
     camera_x = max(0, min(camera_x, (GRID_WIDTH * TILE_SIZE) - SCREEN_WIDTH))
 
     # --- Mouse Placement ---
@@ -167,42 +363,41 @@ while running:
         mouse_x, mouse_y = pygame.mouse.get_pos()
         world_x = mouse_x + camera_x
         grid_x, grid_y = world_x // TILE_SIZE, mouse_y // TILE_SIZE
+        if not (mouse_buttons[0] or mouse_buttons[2]):
+            end_stroke()
 
         if 0 <= grid_x < GRID_WIDTH and 0 <= grid_y < GRID_HEIGHT:
             if mouse_buttons[0]: # Left Click
                 if current_object_id is not None:
                     # Place Object (only once per click suggested, but this follows tile logic)
-                    if not any(obj[0] == grid_x and obj[1] == current_object_id for obj in flagpoles if isinstance(obj, list)):
-                        flagpoles.append([grid_x, current_object_id])
+                    objects.add(grid_x, current_object_id)
                 elif current_tile_id is not None:
                     # Place Tile
-                    level[grid_y][grid_x] = current_tile_id
+                    set_cell(grid_x, grid_y, current_tile_id)
             
             elif mouse_buttons[2]: # Right Click to Clear
                 if current_object_id is not None:
                     # Remove object at this column
-                    flagpoles = [obj for obj in flagpoles if (obj[0] if isinstance(obj, list) else obj) != grid_x]
+                    objects.remove_column(grid_x)
                 else:
-                    level[grid_y][grid_x] = 0
+                    set_cell(grid_x, grid_y, 0)
 
     # --- Draw ---
-    screen.fill((30, 30, 30))
+    screen.fill(BACKGROUND_COLOR)
 
-    # Tiles
-    for y in range(GRID_HEIGHT):
-        for x in range(GRID_WIDTH):
-            tile_id = level[y][x]
-            if tile_id in tile_images:
-                draw_x = (x * TILE_SIZE) - camera_x
-                if -TILE_SIZE < draw_x < SCREEN_WIDTH:
-                    screen.blit(tile_images[tile_id], (draw_x, y * TILE_SIZE))
-
-    # Flagpoles and Props
-    for obj in flagpoles:
-        fx, obj_id = (obj[0], obj[1]) if isinstance(obj, list) else (obj, 10)
+    # Tiles and grid lines, only the chunks in view
+    chunk_width = CHUNK_COLUMNS * TILE_SIZE
+    first_chunk = camera_x // chunk_width
+    last_chunk = min((camera_x + SCREEN_WIDTH) // chunk_width, (GRID_WIDTH - 1) // CHUNK_COLUMNS)
+    for chunk in range(first_chunk, last_chunk + 1):
+        screen.blit(get_chunk(chunk), (chunk * chunk_width - camera_x, 0))
+
+    # Flagpoles and Props, only the columns near the screen
+    for i in objects.range((camera_x - 64) // TILE_SIZE - 1, (camera_x + SCREEN_WIDTH) // TILE_SIZE):
+        fx, obj_id = objects.columns[i], objects.ids[i]
         draw_x = (fx * TILE_SIZE) - camera_x + (TILE_SIZE // 2)
         if -64 < draw_x < SCREEN_WIDTH:
-            if obj_id == 10:
+            if obj_id == FLAGPOLE_ID:
                 draw_y = (GRID_HEIGHT - 3) * TILE_SIZE - 152
                 pygame.draw.rect(screen, (0, 255, 0), (draw_x + 16, draw_y, 16, 152), 2)
             elif obj_id in [11, 12]:
@@ -216,20 +411,24 @@ while running:
                     (draw_x + 20, SCREEN_HEIGHT - 32)
                 ]
                 pygame.draw.polygon(screen, (34, 139, 34), points, 2)
-            
-    # Grid lines
-    offset = camera_x % TILE_SIZE
-    for x in range(0, SCREEN_WIDTH + TILE_SIZE, TILE_SIZE):
-        pygame.draw.line(screen, (60, 60, 60), (x - offset, 0), (x - offset, SCREEN_HEIGHT))
-    for y in range(0, SCREEN_HEIGHT, TILE_SIZE):
-        pygame.draw.line(screen, (60, 60, 60), (0, y), (SCREEN_WIDTH, y))
 
-    # UI
+    # UI, only re-rendered when the text changes
     mode = f"Object: {current_object_id}" if current_object_id else f"Tile: {current_tile_id}"
-    info_text = f"Mode: {mode} | S: Save | F: Flag"
-    ui_surface = FONT.render(info_text, True, (255, 255, 255))
+    info_text = f"Mode: {mode} | S: Save | F: Flag | Ctrl+Z/Y: Undo/Redo"
+    if info_text != ui_text:
+        ui_text = info_text
+        ui_surface = FONT.render(info_text, True, (255, 255, 255))
     screen.blit(ui_surface, (10, 10))
 
     pygame.display.flip()
 
+# Let a save still being written finish
+if save_thread is not None:
+    save_thread.join()
+if save_requested:
+    start_save(LEVEL_PATH, "Level saved.")
+    save_thread.join()
+
+for image_path in tile_image_paths:
+    asset_cache.release_image(image_path)
 pygame.quit()
\ No newline at end of file
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import struct
+import sys
+import numpy as np
+from level_objects import DEFAULT_OBJECT_ID, normalize_objects
+
+# Compact binary level format (.mlvl):
+#   header  magic, version, tile dtype, width, height, tileset hash, object count
+#   tiles   height * width tile ids, row-major
+#   objects object count * (x, id) int32 pairs, same entries as objects.flagpoles
+#   enemies (version 2) count, then count * (x, type, row) int32 triples
+MAGIC = b"MLVL"
+VERSION = 2
+HEADER = struct.Struct("<4sHBxII8sI")
+COUNT = struct.Struct("<I")
+TILE_DTYPES = {1: np.uint8, 2: np.uint16}
+ENEMY_TYPE_NAMES = ["goomba", "koopa"]
+NO_ROW = -1
+
+# Batched level store (.mlvb) for generated levels, all the same size:
+#   header  magic, version, width, height, enemy slots, tileset hash, level count
+#   records level count * (tiles uint8, flagpole column int32, enemy slots * (x, type, row) int32)
+#   unused enemy slots have x = -1, levels are appended by rewriting only the count
+BATCH_MAGIC = b"MLVB"
+BATCH_VERSION = 1
+BATCH_HEADER = struct.Struct("<4sHxxIII8sI")
+
+
+def tileset_hash(tileset_path):
+    with open(tileset_path, "rb") as f:
+        return hashlib.sha1(f.read()).digest()[:8]
+
+
+def is_binary_level(level_path):
+    with open(level_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encode_enemies(enemies):
+    triples = []
+    for enemy in enemies:
+        enemy_type = enemy[1]
+        if isinstance(enemy_type, str):
+            enemy_type = ENEMY_TYPE_NAMES.index(enemy_type)
+        triples.append((enemy[0], enemy_type, enemy[2] if len(enemy) > 2 else NO_ROW))
+    return np.array(triples, dtype=np.int32).reshape(-1, 3)
+
+
+def decode_enemies(triples):
+    enemies = []
+    for x, enemy_type, row in triples.tolist():
+        enemy = [x, ENEMY_TYPE_NAMES[enemy_type]]
+        if row != NO_ROW:
+            enemy.append(row)
+        enemies.append(enemy)
+    return enemies
+
+
+def save_binary(level_path, width, height, tiles, objects, tileset_path="tileset.json", enemies=()):
+    tiles = np.asarray(tiles).reshape(height, width)
+    dtype_code = 1 if tiles.size == 0 or tiles.max() < 256 else 2
+    object_pairs = np.array(normalize_objects(objects), dtype=np.int32).reshape(-1, 2)
+    enemy_triples = encode_enemies(enemies)
+
+    with open(level_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, dtype_code, width, height,
+                            tileset_hash(tileset_path), len(object_pairs)))
+        f.write(np.ascontiguousarray(tiles, dtype=TILE_DTYPES[dtype_code]).tobytes())
+        f.write(object_pairs.tobytes())
+        f.write(COUNT.pack(len(enemy_triples)))
+        f.write(enemy_triples.tobytes())
+
+
+def load_binary(level_path, tileset_path=None):
+    # Tiles are memory-mapped copy-on-write: nothing is read until it is touched
+    # and set_tile() changes never reach the file.
+    with open(level_path, "rb") as f:
+        magic, version, dtype_code, width, height, stored_hash, object_count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version > VERSION:
+        raise ValueError(f"{level_path} is not a binary level (up to version {VERSION})")
+    if tileset_path and stored_hash != tileset_hash(tileset_path):
+        print(f"Warning: {level_path} was saved against a different tileset than {tileset_path}")
+
+    dtype = TILE_DTYPES[dtype_code]
+    tiles = np.memmap(level_path, dtype=dtype, mode="c", offset=HEADER.size, shape=(height, width))
+    objects_offset = HEADER.size + tiles.nbytes
+    objects = np.fromfile(level_path, dtype=np.int32, count=object_count * 2, offset=objects_offset)
+
+    level_objects = {"flagpoles": objects.reshape(-1, 2).tolist()}
+    if version >= 2:
+        enemies_offset = objects_offset + objects.nbytes
+        (enemy_count,) = np.fromfile(level_path, dtype=np.uint32, count=1, offset=enemies_offset)
+        triples = np.fromfile(level_path, dtype=np.int32, count=int(enemy_count) * 3,
+                              offset=enemies_offset + COUNT.size)
+        level_objects["enemies"] = decode_enemies(triples.reshape(-1, 3))
+
+    return {
+        "width": width,
+        "height": height,
+        "tiles": tiles,
+        "objects": level_objects,
+    }
+
+
+def batch_dtype(width, height, enemy_slots):
+    return np.dtype([
+        ("tiles", np.uint8, (height, width)),
+        ("flagpole", "<i4"),
+        ("enemies", "<i4", (enemy_slots, 3)),
+    ])
+
+
+def append_batch(store_path, tiles, flagpoles, enemies, tileset_path="tileset.json"):
+    # tiles (count, height, width), flagpoles (count,), enemies (count, slots, 3)
+    count, height, width = tiles.shape
+    enemy_slots = enemies.shape[1]
+    try:
+        with open(store_path, "rb") as f:
+            header = BATCH_HEADER.unpack(f.read(BATCH_HEADER.size))
+    except FileNotFoundError:
+        header = (BATCH_MAGIC, BATCH_VERSION, width, height, enemy_slots, tileset_hash(tileset_path), 0)
+        with open(store_path, "wb") as f:
+            f.write(BATCH_HEADER.pack(*header))
+
+    magic, version, store_width, store_height, store_slots, stored_hash, stored = header
+    if magic != BATCH_MAGIC or version != BATCH_VERSION:
+        raise ValueError(f"{store_path} is not a level store")
+    if (store_width, store_height, store_slots) != (width, height, enemy_slots):
+        raise ValueError(f"{store_path} holds {store_width}x{store_height} levels with {store_slots} enemy slots, "
+                         f"got {width}x{height} with {enemy_slots}")
+
+    records = np.zeros(count, dtype=batch_dtype(width, height, enemy_slots))
+    records["tiles"] = tiles
+    records["flagpole"] = flagpoles
+    records["enemies"] = enemies
+    with open(store_path, "r+b") as f:
+        f.seek(BATCH_HEADER.size + stored * records.itemsize)
+        f.write(records.tobytes())
+        f.seek(0)
+        f.write(BATCH_HEADER.pack(magic, version, width, height, enemy_slots, stored_hash, stored + count))
+    return stored + count
+
+
+def open_batch(store_path, tileset_path=None):
+    # Memory-mapped records, opening a store with millions of levels reads only the header
+    with open(store_path, "rb") as f:
+        magic, version, width, height, enemy_slots, stored_hash, count = BATCH_HEADER.unpack(
+            f.read(BATCH_HEADER.size))
+    if magic != BATCH_MAGIC or version > BATCH_VERSION:
+        raise ValueError(f"{store_path} is not a level store")
+    if tileset_path and stored_hash != tileset_hash(tileset_path):
+        print(f"Warning: {store_path} was saved against a different tileset than {tileset_path}")
+    return np.memmap(store_path, dtype=batch_dtype(width, height, enemy_slots), mode="r",
+                     offset=BATCH_HEADER.size, shape=(count,))
+
+
+def batch_level_data(records, index):
+    # One stored level in the same structure as a level file
+    record = records[index]
+    height, width = record["tiles"].shape
+    triples = record["enemies"]
+    return {
+        "width": width,
+        "height": height,
+        "tiles": np.array(record["tiles"]),
+        "objects": {
+            "flagpoles": [[int(record["flagpole"]), DEFAULT_OBJECT_ID]],
+            "enemies": decode_enemies(triples[triples[:, 0] >= 0]),
+        },
+    }
+
+
+def load_level_data(level_path, tileset_path=None):
+    # Already loaded level data (e.g. from batch_level_data) is used as is
+    if isinstance(level_path, dict):
+        return level_path
+    if is_binary_level(level_path):
+        return load_binary(level_path, tileset_path)
+    with open(level_path, "r") as f:
+        return json.load(f)
+
+
+def json_to_binary(json_path, binary_path, tileset_path="tileset.json"):
+    with open(json_path, "r") as f:
+        data = json.load(f)
+    objects = data.get("objects", {})
+    save_binary(binary_path, data["width"], data["height"], data["tiles"], objects.get("flagpoles", []),
+                tileset_path, objects.get("enemies", []))
+
+
+def binary_to_json(binary_path, json_path, tileset_path=None):
+    data = load_binary(binary_path, tileset_path)
+    data["tiles"] = np.asarray(data["tiles"]).tolist()
+    with open(json_path, "w") as f:
+        json.dump(data, f)
+
+
+if __name__ == "__main__":
+    # python level_format.py levels/1-1.json levels/1-1.mlvl (or the other way round)
+    if len(sys.argv) != 3:
+        print("Usage: python level_format.py <source> <destination>")
+        sys.exit(1)
+    source, destination = sys.argv[1], sys.argv[2]
+    if is_binary_level(source):
+        binary_to_json(source, destination)
+    else:
+        json_to_binary(source, destination)
+    print(f"Converted {source} -> {destination}")
@@ -0,0 +1,250 @@
+import argparse
+import math
+import time
+import numpy as np
+from level_format import append_batch, ENEMY_TYPE_NAMES, NO_ROW
+from level_loader import CHUNK_COLUMNS
+from mario import Mario
+
+# python level_generator.py levels/generated.mlvb --count 10000 --difficulty 0.5 --seed 1
+#   Seeded, vectorized level generation straight into a batched level store.
+
+# Tile ids from tileset.json
+AIR, BRICK, QUESTION, FLOOR, SQUARE_BLOCK = 0, 1, 3, 4, 5
+PIPE_TOP_LEFT, PIPE_TOP_RIGHT, PIPE_LEFT, PIPE_RIGHT = 6, 7, 8, 9
+FLAGPOLE_ID = 10
+
+# Levels are a start runway, SECTIONS sections with at most one feature each and
+# an end runway with the flagpole. Sections are one render chunk wide, so the
+# same sections can be streamed one by one into a StreamingLevel.
+FLAT, GAP, PIPE, STAIRS, BLOCKS = range(5)
+SECTION_WIDTH = CHUNK_COLUMNS
+SECTIONS = 12
+HEIGHT = 15
+FLOOR_ROWS = 2
+BLOCK_ROW_GAP = 4 # rows between the floor and a brick / question row, as in 1-1
+EDGE_MARGIN = 2 # flat columns kept on both sides of every feature
+FLAGPOLE_OFFSET = 10 # columns from the right edge
+
+GOOMBA, KOOPA = (ENEMY_TYPE_NAMES.index(name) for name in ("goomba", "koopa"))
+KOOPA_CHANCE = 0.25
+QUESTION_CHANCE = 0.3
+MAX_ATTEMPTS = 10
+
+
+def jump_limits(tile_size=16, height=HEIGHT):
+    # Highest step (in tiles) mario can jump onto, and for every rise from
+    # -height to that step the widest gap (in columns) he can clear. Taken from
+    # Mario's own constants at scale 1, mario has to land with his whole body.
+    mario = Mario(0, 0, 1)
+    v0 = -mario.jump_force
+    g = mario.gravity
+    max_rise = int(v0 * v0 / (2 * g) // tile_size)
+
+    reach = np.zeros(height + max_rise + 1, dtype=np.int64)
+    for rise in range(-height, max_rise + 1):
+        # time until mario comes back down to the landing surface
+        t = (v0 + math.sqrt(v0 * v0 - 2 * g * rise * tile_size)) / g
+        reach[rise + height] = max(int((mario.horizontal_speed * t - mario.width) // tile_size), 0)
+    return max_rise, reach
+
+
+class LevelGenerator:
+    # Every level of a batch is generated at once with (count, sections) and
+    # (count, height, width) arrays, no Python loop per level or per tile.
+    # difficulty in [0, 1] scales how often gaps / pipes / stairs show up and
+    # how big they get, the max_* arguments override the derived limits.
+    def __init__(self, difficulty=0.5, sections=SECTIONS, height=HEIGHT, tile_size=16,
+                 max_gap=None, max_pipe=None, max_stairs=None, enemy_chance=None):
+        self.difficulty = difficulty
+        self.sections = sections
+        self.height = height
+        self.width = (sections + 2) * SECTION_WIDTH
+        self.max_rise, self.reach = jump_limits(tile_size, height)
+
+        # Tallest pipe / staircase is limited by the jump, the floor and the block row
+        tallest = min(self.max_rise, height - FLOOR_ROWS - 1)
+        gap_reach = int(self.reach[height])
+        self.max_gap = max_gap if max_gap is not None else max(1, round(gap_reach * (0.4 + 0.6 * difficulty)))
+        self.max_pipe = max_pipe if max_pipe is not None else max(2, round(tallest * (0.5 + 0.5 * difficulty)))
+        self.max_stairs = max_stairs if max_stairs is not None else max(2, round(tallest * (0.5 + 0.5 * difficulty)))
+        self.enemy_chance = enemy_chance if enemy_chance is not None else 0.1 + 0.4 * difficulty
+
+        if self.max_gap > gap_reach:
+            raise ValueError(f"max_gap {self.max_gap} is wider than mario can jump ({gap_reach})")
+        if max(self.max_pipe, self.max_stairs) > tallest:
+            raise ValueError(f"Pipes and stairs can be at most {tallest} tiles tall")
+        if 2 * self.max_stairs > SECTION_WIDTH - 2 * EDGE_MARGIN:
+            raise ValueError(f"Stairs of {self.max_stairs} do not fit in a {SECTION_WIDTH} column section")
+
+        # FLAT, GAP, PIPE, STAIRS, BLOCKS
+        weights = np.array([1.0 - 0.6 * difficulty, 0.3 + 0.5 * difficulty, 0.3 + 0.3 * difficulty,
+                            0.1 + 0.3 * difficulty, 0.6])
+        self.feature_chances = weights / weights.sum()
+
+    def layout(self, rng, count):
+        # One feature per section: kind, size and first column
+        shape = (count, self.sections)
+        kind = rng.choice(len(self.feature_chances), size=shape, p=self.feature_chances)
+
+        size = np.zeros(shape, dtype=np.int64)
+        size = np.where(kind == GAP, rng.integers(1, self.max_gap + 1, size=shape), size)
+        size = np.where(kind == PIPE, rng.integers(2, self.max_pipe + 1, size=shape), size)
+        size = np.where(kind == STAIRS, rng.integers(2, self.max_stairs + 1, size=shape), size)
+        size = np.where(kind == BLOCKS, rng.integers(3, 6, size=shape), size)
+
+        # Columns the feature takes up, stairs go up and back down
+        footprint = np.select([kind == PIPE, kind == STAIRS, kind == FLAT], [2, 2 * size, 0], size)
+        free = SECTION_WIDTH - 2 * EDGE_MARGIN - footprint
+        offset = EDGE_MARGIN + (rng.random(shape) * (free + 1)).astype(np.int64)
+        start = (np.arange(1, self.sections + 1) * SECTION_WIDTH)[None, :] + offset
+        return kind, size, footprint, start
+
+    def build(self, rng, count):
+        kind, size, footprint, start = self.layout(rng, count)
+        height, width = self.height, self.width
+        floor_top = height - FLOOR_ROWS
+
+        # (count, sections, width) masks of the columns every feature covers
+        rel = np.arange(width)[None, None, :] - start[:, :, None]
+        inside = (rel >= 0) & (rel < footprint[:, :, None])
+
+        def covered(feature):
+            return (inside & (kind == feature)[:, :, None]).any(axis=1)
+
+        gap = covered(GAP)
+        stairs = np.where(inside & (kind == STAIRS)[:, :, None],
+                          np.minimum(rel + 1, 2 * size[:, :, None] - rel), 0).max(axis=1)
+        pipe = np.where(inside & (kind == PIPE)[:, :, None], size[:, :, None], 0).max(axis=1)
+        pipe_left = (inside & (kind == PIPE)[:, :, None] & (rel == 0)).any(axis=1)
+        blocks = covered(BLOCKS)
+
+        # --- Paint tiles, rows against per-column heights ---
+        rows = np.arange(height)[None, :, None]
+        top = (floor_top - stairs - pipe)[:, None, :]
+        tiles = np.zeros((count, height, width), dtype=np.uint8)
+        tiles[(rows >= floor_top) & ~gap[:, None, :]] = FLOOR
+
+        obstacle = (rows >= top) & (rows < floor_top)
+        tiles[obstacle & (stairs > 0)[:, None, :]] = SQUARE_BLOCK
+        is_pipe = obstacle & (pipe > 0)[:, None, :]
+        left = pipe_left[:, None, :]
+        tiles[is_pipe & (rows == top) & left] = PIPE_TOP_LEFT
+        tiles[is_pipe & (rows == top) & ~left] = PIPE_TOP_RIGHT
+        tiles[is_pipe & (rows > top) & left] = PIPE_LEFT
+        tiles[is_pipe & (rows > top) & ~left] = PIPE_RIGHT
+
+        block_row = tiles[:, floor_top - BLOCK_ROW_GAP, :]
+        question = rng.random((count, width)) < QUESTION_CHANCE
+        block_row[blocks & question] = QUESTION
+        block_row[blocks & ~question] = BRICK
+
+        # --- Enemies in the middle of flat sections ---
+        has_enemy = ((kind == FLAT) | (kind == BLOCKS)) & (rng.random(kind.shape) < self.enemy_chance)
+        enemy_type = np.where(rng.random(kind.shape) < KOOPA_CHANCE, KOOPA, GOOMBA)
+        enemies = np.full((count, self.sections, 3), -1, dtype=np.int32)
+        enemies[..., 0] = np.where(has_enemy, (np.arange(1, self.sections + 1) * SECTION_WIDTH + SECTION_WIDTH // 2)[None, :], -1)
+        enemies[..., 1] = np.where(has_enemy, enemy_type, -1)
+        enemies[..., 2] = NO_ROW
+
+        surface = np.where(gap, -1, stairs + pipe)
+        return tiles, surface, enemies
+
+    def reachable(self, surface):
+        # surface is the standing height per column in tiles, -1 over gaps.
+        # Every step up has to be jumpable and every gap clearable from its left edge.
+        standing = surface >= 0
+        rise = surface[:, 1:] - surface[:, :-1]
+        ok = ~(standing[:, 1:] & standing[:, :-1] & (rise > self.max_rise)).any(axis=1)
+
+        gap = ~standing
+        edge = np.zeros((len(gap), 1), dtype=bool)
+        starts = gap & ~np.hstack([edge, gap[:, :-1]])
+        ends = gap & ~np.hstack([gap[:, 1:], edge])
+        level, first = np.nonzero(starts)
+        _, last = np.nonzero(ends)
+        # Gaps never touch the runways, so both sides exist
+        gap_rise = surface[level, last + 1] - surface[level, first - 1]
+        cleared = (gap_rise <= self.max_rise) & (
+            last - first + 1 <= self.reach[np.clip(gap_rise, -self.height, self.max_rise) + self.height])
+        ok[level[~cleared]] = False
+        return ok
+
+    def generate(self, count, seed=None):
+        # Returns tiles (count, height, width), flagpole columns (count,) and
+        # enemy slots (count, sections, 3) as stored by level_format.append_batch
+        rng = np.random.default_rng(seed)
+        tiles, surface, enemies = self.build(rng, count)
+        # Regenerate the few levels that failed the check
+        for _ in range(MAX_ATTEMPTS):
+            bad = np.flatnonzero(~self.reachable(surface))
+            if not len(bad):
+                break
+            tiles[bad], surface[bad], enemies[bad] = self.build(rng, len(bad))
+        else:
+            keep = self.reachable(surface)
+            print(f"Warning: dropped {np.count_nonzero(~keep)} levels that failed the reachability check")
+            tiles, enemies = tiles[keep], enemies[keep]
+
+        flagpoles = np.full(len(tiles), self.width - FLAGPOLE_OFFSET, dtype=np.int32)
+        return tiles, flagpoles, enemies
+
+    def generate_level(self, seed=None):
+        # A single level in the structure Level reads
+        tiles, flagpoles, enemies = self.generate(1, seed)
+        triples = enemies[0][enemies[0][:, 0] >= 0]
+        return {
+            "width": self.width,
+            "height": self.height,
+            "tiles": tiles[0],
+            "objects": {
+                "flagpoles": [[int(flagpoles[0]), FLAGPOLE_ID]],
+                "enemies": [[int(x), ENEMY_TYPE_NAMES[enemy_type]] for x, enemy_type, _ in triples],
+            },
+        }
+
+
+class SectionStream:
+    # generate(chunk) callable for StreamingLevel: an endless level where every
+    # chunk after the first is one generated section. Chunks only depend on
+    # (seed, chunk), so resets and replays see the same level.
+    def __init__(self, seed=0, **generator_kwargs):
+        self.seed = seed
+        self.generator = LevelGenerator(sections=1, **generator_kwargs)
+
+    def __call__(self, chunk):
+        rng = np.random.default_rng((self.seed, chunk))
+        tiles, surface, _ = self.generator.build(rng, 1)
+        for _ in range(MAX_ATTEMPTS):
+            if self.generator.reachable(surface)[0]:
+                break
+            tiles, surface, _ = self.generator.build(rng, 1)
+        else:
+            tiles[:, :self.generator.height - FLOOR_ROWS] = AIR
+            tiles[:, self.generator.height - FLOOR_ROWS:] = FLOOR
+        # Chunk 0 is the start runway, the others the generated section
+        section = 0 if chunk == 0 else 1
+        return tiles[0, :, section * SECTION_WIDTH:(section + 1) * SECTION_WIDTH]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate levels into a batched level store")
+    parser.add_argument("store", help="output .mlvb store, levels are appended")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=1000, help="levels generated per NumPy pass")
+    parser.add_argument("--difficulty", type=float, default=0.5)
+    parser.add_argument("--sections", type=int, default=SECTIONS)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    generator = LevelGenerator(args.difficulty, args.sections)
+    batch_seeds = np.random.SeedSequence(args.seed).spawn((args.count + args.batch - 1) // args.batch)
+    start = time.perf_counter()
+    total = 0
+    for seed in batch_seeds:
+        count = min(args.batch, args.count - total)
+        tiles, flagpoles, enemies = generator.generate(count, seed)
+        append_batch(args.store, tiles, flagpoles, enemies)
+        total += len(tiles)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {total} levels into {args.store} in {elapsed:.2f}s ({total / elapsed:.0f} levels/s)")
@@ -1,132 +1,486 @@
-import json
+import math
 import os
+import numpy as np
 import pygame
+import struct
+from bisect import bisect_left
+from collections import OrderedDict
+from assets import asset_cache
+from level_format import load_level_data
+from level_objects import ObjectLayer
+
+# Static tiles are pre-rendered in vertical strips of this many columns
+CHUNK_COLUMNS = 16
+MAX_CACHED_CHUNKS = 8
+
+# What a tile turns into when mario hits it from below, by tileset name
+BUMP_RESULTS = {"brick": "air", "question_block": "used_block"}
+
+# Render state that depends on the draw scale. Every scale drawn keeps its
+# own copy, so renderers at different scales (the window at 3, pixel
+# observations at 1) don't rebuild each other's caches every frame.
+SCALED_RENDER_STATE = ("chunks", "scaled_tiles", "object_sprites", "object_lefts", "object_max_width")
+
+# frame_durations in tileset.json are counted in ticks of this rate
+ANIMATION_TICK_RATE = 60
+
+# animation_timer, number of cells that differ from the loaded level
+STATE_HEADER = struct.Struct("<dI")
+
+def max_tile_id(tiles):
+    # Memory-mapped tiles are bounded by their dtype, finding the real
+    # maximum would read every tile
+    if isinstance(tiles, np.memmap):
+        return int(np.iinfo(tiles.dtype).max)
+    return int(tiles.max()) if tiles.size else 0
+
 
 class Level:
-    def __init__(self, level_path, tileset_path):
-        # 1. Load level layout data
-        with open(level_path, "r") as f:
-            level_data = json.load(f)
+    def __init__(self, level_path, tileset_path, load_images=True):
+        # 1. Load level layout data (JSON or the binary .mlvl format)
+        level_data = load_level_data(level_path, tileset_path)
 
         self.width = level_data["width"]
         self.height = level_data["height"]
-        
-        self.grid = level_data["tiles"] if isinstance(level_data.get("tiles"), list) else level_data
-        self.flagpoles = level_data.get("objects", {}).get("flagpoles", [])
 
-        # 2. Load tileset configuration
-        with open(tileset_path, "r") as f:
-            tileset_config = json.load(f)
+        tiles = level_data["tiles"] if isinstance(level_data.get("tiles"), (list, np.ndarray)) else level_data
+        self.enemies = level_data.get("objects", {}).get("enemies", [])
+
+        if not isinstance(tiles, np.ndarray):
+            tiles = np.asarray(tiles, dtype=np.int64)
+        tiles = tiles.reshape(self.height, self.width)
+
+        # 2. Load tileset configuration (parsed once per process and shared)
+        self.load_tileset(tileset_path, max_tile_id(tiles))
+        self.load_objects(level_data.get("objects", {}).get("flagpoles", []))
+
+        # Level grid as a contiguous (height, width) array of tile ids, binary
+        # levels keep their (copy-on-write) memory-mapped array as long as the
+        # dtype fits. Arrays passed in are copied, set_tile() writes to the grid.
+        if isinstance(tiles, np.memmap) and tiles.dtype == self.grid_dtype:
+            self.grid = tiles
+            # A second, read-only mapping of the file: set_tile() writes only
+            # reach the grid's private pages, so this stays the level as loaded
+            self.initial_grid = np.memmap(tiles.filename, dtype=tiles.dtype, mode="r",
+                                          offset=tiles.offset, shape=tiles.shape)
+        else:
+            self.grid = tiles.astype(self.grid_dtype)
+            self.initial_grid = self.grid.copy()
+            self.initial_grid.flags.writeable = False
+        # Flat indices of the cells set_tile() wrote since load, so saving and
+        # restoring state never has to compare the whole grid
+        self.edited_cells = set()
+        # World column of grid[:, 0], only a StreamingLevel moves it
+        self.col_offset = 0
+
+        # Collision grid, built once here and kept in sync by set_tile()
+        self.solid = self.solid_lut[self.grid]
+        # Bricks break and question blocks empty when mario bumps them
+        self.interactive_blocks = True
+
+        # 3. Load tile images (headless simulation skips this, draw() loads them on demand)
+        self.setup_images(load_images)
+
+    def load_tileset(self, tileset_path, max_tile_id=0):
+        tileset_config = asset_cache.load_tileset(tileset_path)
 
         self.tile_size = tileset_config["tile_size"]
         self.tileset = tileset_config["tiles"]
 
-        # 3. Load tile images
+        # Per tile id lookup arrays, so no per-cell str()/dict lookups are needed
+        max_id = max(max_tile_id, max(int(tile_id) for tile_id in self.tileset))
+        self.build_tile_tables(max_id)
+        self.grid_dtype = np.uint8 if max_id < 256 else np.uint16
+
+    def load_objects(self, entries):
+        # Flagpoles and scenery, sorted by column, plus the flagpole / pit trigger volumes
+        self.objects = ObjectLayer(entries)
+        self.objects.build_triggers(self.tile_size, self.height)
+
+    def setup_images(self, load_images):
+        self.tile_images = None
+        self.acquired_images = []
+        if load_images:
+            self.load_tile_images()
+
+        self.animation_timer = 0
+        self.render_scale = None
+        self.render_caches = {}
+        # Set by dirty-rect renderers, only they consume changed_cells
+        self.track_changed_cells = False
+
+    def advance_animation(self, dt):
+        # The level's one animation clock, every animated tile reads from it
+        self.animation_timer += dt
+        self.update_animation_frames()
+
+    def update_animation_frames(self):
+        if self.frame_lut_time == self.animation_timer:
+            return
+        self.frame_lut_time = self.animation_timer
+        self.animation_frames_at(self.animation_timer, self.frame_lut)
+
+    def animation_frames_at(self, time, out=None):
+        # Frame index of every tile id at animation time (seconds)
+        # The tiny epsilon keeps accumulated 1/60 steps from landing a tick early
+        tick = int(time * ANIMATION_TICK_RATE + 1e-6)
+        return np.take(self.timeline_frames, self.timeline_start + tick % self.timeline_length, out=out)
+
+    def build_tile_tables(self, max_id):
+        self.solid_lut = np.zeros(max_id + 1, dtype=bool)
+        self.object_lut = np.zeros(max_id + 1, dtype=bool)
+        self.animated_lut = np.zeros(max_id + 1, dtype=bool)
+        self.frame_count_lut = np.zeros(max_id + 1, dtype=np.uint8)
+
+        for tile_id, tile_data in self.tileset.items():
+            i = int(tile_id)
+            self.solid_lut[i] = tile_data.get("solid", False)
+            self.object_lut[i] = tile_data.get("is_object", False)
+            self.frame_count_lut[i] = len(tile_data.get("frames", []))
+            # Skip air (0) and objects, anything else with several frames animates
+            self.animated_lut[i] = i != 0 and not self.object_lut[i] and self.frame_count_lut[i] > 1
+
+        # Tiles drawn into the static chunks
+        self.static_lut = (self.frame_count_lut == 1) & ~self.object_lut
+        self.static_lut[0] = False
+
+        # Tile id after a head bump, unchanged for everything not in BUMP_RESULTS
+        ids_by_name = {tile_data.get("name"): int(tile_id) for tile_id, tile_data in self.tileset.items()}
+        self.bump_lut = np.arange(max_id + 1)
+        for name, result in BUMP_RESULTS.items():
+            if name in ids_by_name and result in ids_by_name:
+                self.bump_lut[ids_by_name[name]] = ids_by_name[result]
+
+        # Animation timelines: the frame index for every tick of a tile's
+        # cycle, all tiles in one flat array. Entry 0 is the shared one-tick
+        # timeline of tiles without frame_durations.
+        timelines = [[0]]
+        self.timeline_start = np.zeros(max_id + 1, dtype=np.int64)
+        self.timeline_length = np.ones(max_id + 1, dtype=np.int64)
+        for tile_id, tile_data in self.tileset.items():
+            durations = tile_data.get("frame_durations")
+            if durations:
+                i = int(tile_id)
+                self.timeline_start[i] = sum(len(timeline) for timeline in timelines)
+                self.timeline_length[i] = sum(durations)
+                timelines.append([frame for frame, ticks in enumerate(durations) for _ in range(ticks)])
+        self.timeline_frames = np.array([frame for timeline in timelines for frame in timeline], dtype=np.uint8)
+        # Current frame of every tile id, refreshed once per clock change
+        self.frame_lut = np.zeros(max_id + 1, dtype=np.uint8)
+        self.frame_lut_time = None
+
+    def load_tile_images(self):
         self.tile_images = {}
+        self.tile_paths = {}
         for tile_id, tile_data in self.tileset.items():
             frames = tile_data.get("frames", [])
             self.tile_images[int(tile_id)] = []
+            self.tile_paths[int(tile_id)] = []
             for f_name in frames:
                 img_path = os.path.join("sprites", "tiles", f_name)
-                if os.path.exists(img_path):
-                    image = pygame.image.load(img_path).convert_alpha()
+                if asset_cache.has_image(img_path):
+                    image = asset_cache.get_native(img_path)
                     self.tile_images[int(tile_id)].append(image)
+                    self.tile_paths[int(tile_id)].append(img_path)
                 else:
                     print(f"Warning: Missing tile image {img_path}")
 
-        self.animation_timer = 0
+    def acquire_image(self, path, size):
+        self.acquired_images.append((path, size))
+        return asset_cache.acquire_image(path, size=size)
+
+    def release_images(self):
+        for path, size in self.acquired_images:
+            asset_cache.release_image(path, size=size)
+        self.acquired_images = []
+
+    def close(self):
+        self.release_images()
+        self.render_scale = None
+        self.render_caches = {}
+        self.chunks = OrderedDict()
 
     def get_animated_frame_index(self, tile_id):
-        tile_info = self.tileset.get(str(tile_id))
-        durations = tile_info.get("frame_durations")
-        
-        if not durations:
-            return 0
-            
-        total_frames = sum(durations)
-        total_time = total_frames / 60.0
-        current_time = self.animation_timer % total_time
-        
-        elapsed = 0
-        for i, d in enumerate(durations):
-            elapsed += (d / 60.0)
-            if current_time < elapsed:
-                return i
-        return 0
-
-    def draw(self, surface, dt, camera_x=0, scale=1):
-        self.animation_timer += dt
+        self.update_animation_frames()
+        return int(self.frame_lut[tile_id])
 
-        # --- 1. Draw Standard Tiles ---
-        for row in range(self.height):
-            for col in range(self.width):
-                tile_id = self.grid[row][col]
-                # Skip air (0) and any tile marked as an object (like ID 10-14)
-                tile_info = self.tileset.get(str(tile_id))
-                is_obj = tile_info.get("is_object", False) if tile_info else False
-
-                if tile_id != 0 and not is_obj and tile_id in self.tile_images:
-                    img_list = self.tile_images[tile_id]
-                    if len(img_list) > 1:
-                        frame_idx = self.get_animated_frame_index(tile_id)
-                        base_image = img_list[min(frame_idx, len(img_list) - 1)]
-                    else:
-                        base_image = img_list[0]
-
-                    x = col * self.tile_size * scale - camera_x
-                    y = row * self.tile_size * scale
-
-                    tile_image = pygame.transform.scale(
-                        base_image,
-                        (int(self.tile_size * scale), int(self.tile_size * scale))
-                    )
-                    surface.blit(tile_image, (x, y))
-
-        # --- 2. Draw Objects (Flagpoles, Bushes, Clouds) ---
-        for obj in self.flagpoles:
-            # Handle both legacy format [x] and new format [x, id]
-            if isinstance(obj, list):
-                fx, obj_id = obj[0], obj[1]
-            else:
-                fx, obj_id = obj, 10 # Default to flagpole ID
-            
-            str_id = str(obj_id)
-            if obj_id in self.tile_images and len(self.tile_images[obj_id]) > 0:
-                obj_img = self.tile_images[obj_id][0]
-                
-                # Metadata from the tileset
-                info = self.tileset[str_id]
-                w = info["width"] * scale
-                h = info["height"] * scale
-                
-                scaled_img = pygame.transform.scale(obj_img, (int(w), int(h)))
-                
-                # CENTER LOGIC: (column * size) + (half tile) - (half sprite width)
-                draw_x = (fx * self.tile_size * scale) - camera_x + (self.tile_size // 2 * scale) - (w // 2)
-                
-                # Y POSITION:
-                if "cloud" in info["name"]:
-                    # Clouds float high (adjust -12 as needed)
-                    draw_y = (self.height - 12) * self.tile_size * scale
-                elif "hill" in info["name"]:
-                    # Ground level for Flagpole and Bushes (above floor tiles at height - 2)
-                    draw_y = (self.height - 2) * self.tile_size * scale - h
-                else:
-                    draw_y = (self.height - 2) * self.tile_size * scale - h
-                surface.blit(scaled_img, (draw_x, draw_y))
+    def build_render_cache(self, scale):
+        if self.tile_images is None:
+            self.load_tile_images()
+
+        size = self.tile_size * scale
+        if self.render_scale is None:
+            # Cells set_tile() changed since the last draw, for dirty-rect renderers
+            self.changed_cells = []
+            # Animated cells (question blocks) are drawn on top of the static chunks
+            self.animated_cells = {}
+            self.add_animated_cells(self.col_offset, self.grid)
+        self.render_scale = scale
+        self.chunks = OrderedDict()
+
+        # Tile and object images are scaled once per scale instead of every frame
+        self.scaled_tiles = {
+            tile_id: [self.acquire_image(path, (size, size)) for path in paths]
+            for tile_id, paths in self.tile_paths.items()
+        }
+
+        # Objects keep their world position so drawing is just a camera offset.
+        # Sorted by x like the object layer, draw() bisects out the visible ones.
+        placements = {}
+        self.object_sprites = []
+        for i, (fx, obj_id) in enumerate(self.objects):
+            if obj_id not in placements:
+                placements[obj_id] = self.object_placement(obj_id, scale)
+            placement = placements[obj_id]
+            if placement is None:
+                continue
+            w, draw_y, scaled_img = placement
+            # CENTER LOGIC: (column * size) + (half tile) - (half sprite width)
+            world_x = (fx * self.tile_size * scale) + (self.tile_size // 2 * scale) - (w // 2)
+            self.object_sprites.append((world_x, draw_y, w, scaled_img, self.objects.order[i]))
+        self.object_sprites.sort(key=lambda sprite: sprite[0])
+        self.object_lefts = [sprite[0] for sprite in self.object_sprites]
+        self.object_max_width = max((sprite[2] for sprite in self.object_sprites), default=0)
+
+    def use_render_scale(self, scale):
+        # Swaps in the render cache of scale, building it the first time
+        if self.render_scale == scale:
+            return
+        if self.render_scale is not None:
+            self.render_caches[self.render_scale] = {name: getattr(self, name) for name in SCALED_RENDER_STATE}
+        cache = self.render_caches.pop(scale, None)
+        if cache is None:
+            self.build_render_cache(scale)
+            return
+        for name, value in cache.items():
+            setattr(self, name, value)
+        self.render_scale = scale
+
+    def forget_chunk_images(self, chunk):
+        # Drops a chunk's pre-rendered surfaces at every scale
+        self.chunks.pop(chunk, None)
+        for cache in self.render_caches.values():
+            cache["chunks"].pop(chunk, None)
+
+    def object_placement(self, obj_id, scale):
+        # (width, draw_y, image) shared by every object with this id, None without an image
+        if obj_id not in self.tile_images or len(self.tile_images[obj_id]) == 0:
+            return None
+        # Metadata from the tileset
+        info = self.tileset[str(obj_id)]
+        w = info["width"] * scale
+        h = info["height"] * scale
+        scaled_img = self.acquire_image(self.tile_paths[obj_id][0], (int(w), int(h)))
+
+        # Y POSITION:
+        if "cloud" in info["name"]:
+            # Clouds float high (adjust -12 as needed)
+            draw_y = (self.height - 12) * self.tile_size * scale
+        else:
+            # Ground level for Flagpole, Bushes and Hills (above floor tiles at height - 2)
+            draw_y = (self.height - 2) * self.tile_size * scale - h
+        return w, draw_y, scaled_img
+
+    def add_animated_cells(self, first_col, block):
+        rows, cols = np.nonzero(self.animated_lut[block])
+        for row, col in zip(rows.tolist(), (cols + first_col).tolist()):
+            self.animated_cells.setdefault(col // CHUNK_COLUMNS, []).append((col, row))
+
+    def get_static_image(self, tile_id):
+        # Skip air (0), any tile marked as an object (like ID 10-16) and animated tiles
+        if not self.static_lut[tile_id]:
+            return None
+        img_list = self.scaled_tiles.get(int(tile_id))
+        return img_list[0] if img_list else None
+
+    def get_chunk(self, chunk):
+        surf = self.chunks.get(chunk)
+        if surf is not None:
+            self.chunks.move_to_end(chunk)
+            return surf
+
+        size = self.tile_size * self.render_scale
+        surf = pygame.Surface((CHUNK_COLUMNS * size, self.height * size), pygame.SRCALPHA)
+        first_col = chunk * CHUNK_COLUMNS
+        first_col -= self.col_offset
+        block = self.grid[:, first_col:first_col + CHUNK_COLUMNS]
+        rows, cols = np.nonzero(self.static_lut[block])
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            image = self.get_static_image(block[row, col])
+            if image:
+                surf.blit(image, (col * size, row * size))
+
+        self.chunks[chunk] = surf
+        if len(self.chunks) > MAX_CACHED_CHUNKS:
+            self.chunks.popitem(last=False)
+        return surf
+
+    def visible_chunks(self, camera_x, view_width, scale):
+        chunk_width = CHUNK_COLUMNS * self.tile_size * scale
+        last_col = min(self.width, self.col_offset + self.grid.shape[1]) - 1
+        first_chunk = max(int(camera_x // chunk_width), self.col_offset // CHUNK_COLUMNS)
+        last_chunk = min(int((camera_x + view_width) // chunk_width), last_col // CHUNK_COLUMNS)
+        return range(first_chunk, last_chunk + 1)
+
+    def visible_animated(self, camera_x, view_width, scale=1):
+        # (tile_id, screen rect) of the animated cells in view
+        self.use_render_scale(scale)
+        size = self.tile_size * scale
+        cells = []
+        for chunk in self.visible_chunks(camera_x, view_width, scale):
+            for col, row in self.animated_cells.get(chunk, ()):
+                rect = pygame.Rect(math.floor(col * size - camera_x), row * size, size, size)
+                cells.append((int(self.grid[row, col - self.col_offset]), rect))
+        return cells
+
+    def draw(self, surface, dt, camera_x=0, scale=1, animation_time=None):
+        # Off-screen renderers pass animation_time instead: the level's own
+        # clock and changed_cells belong to the main renderer and are left alone
+        if animation_time is None:
+            self.advance_animation(dt)
+            frame_lut = self.frame_lut
+        else:
+            frame_lut = self.animation_frames_at(animation_time)
+        self.use_render_scale(scale)
+        if animation_time is None:
+            self.changed_cells = []
+
+        size = self.tile_size * scale
+        chunk_width = CHUNK_COLUMNS * size
+        view_right = camera_x + surface.get_width()
+        visible = self.visible_chunks(camera_x, surface.get_width(), scale)
+
+        # --- 1. Draw Standard Tiles (pre-composited chunks) ---
+        for chunk in visible:
+            # floor keeps on-screen tiles on the same pixel as blitting them one by one
+            surface.blit(self.get_chunk(chunk), (math.floor(chunk * chunk_width - camera_x), 0))
+
+        # --- 2. Draw Animated Tiles ---
+        frames = {}
+        for chunk in visible:
+            for col, row in self.animated_cells.get(chunk, ()):
+                tile_id = int(self.grid[row, col - self.col_offset])
+                base_image = frames.get(tile_id)
+                if base_image is None:
+                    img_list = self.scaled_tiles[tile_id]
+                    base_image = img_list[min(int(frame_lut[tile_id]), len(img_list) - 1)]
+                    frames[tile_id] = base_image
+                surface.blit(base_image, (math.floor(col * size - camera_x), row * size))
+
+        # --- 3. Draw Objects (Flagpoles, Bushes, Clouds) ---
+        # Only the x range that can reach the screen, drawn in file order so overlaps stay the same
+        first = bisect_left(self.object_lefts, camera_x - self.object_max_width)
+        last = bisect_left(self.object_lefts, view_right)
+        visible = [sprite for sprite in self.object_sprites[first:last] if sprite[0] + sprite[2] > camera_x]
+        visible.sort(key=lambda sprite: sprite[4])
+        for world_x, draw_y, w, image, _ in visible:
+            surface.blit(image, (math.floor(world_x - camera_x), draw_y))
+
+    def set_tile(self, col, row, tile_id):
+        # col is a world column
+        self.grid[row, col - self.col_offset] = tile_id
+        self.edited_cells.add(row * self.grid.shape[1] + col - self.col_offset)
+        self.solid[row, col - self.col_offset] = self.solid_lut[tile_id]
+        if self.render_scale is not None:
+            self.redraw_cell(col, row)
+            if self.track_changed_cells:
+                self.changed_cells.append((col, row))
+
+    def bump_tile(self, col, row):
+        # Mario hit this cell from below. Returns the tile id it had when it
+        # changed (brick broken, question block used), otherwise None.
+        if not self.interactive_blocks:
+            return None
+        local_col = col - self.col_offset
+        if not (0 <= row < self.height and 0 <= local_col < self.grid.shape[1]):
+            return None
+        tile_id = int(self.grid[row, local_col])
+        new_id = int(self.bump_lut[tile_id]) if tile_id < len(self.bump_lut) else tile_id
+        if new_id == tile_id:
+            return None
+        self.set_tile(col, row, new_id)
+        return tile_id
+
+    def redraw_cell(self, col, row):
+        chunk = col // CHUNK_COLUMNS
+        tile_id = self.grid[row, col - self.col_offset]
+
+        cells = self.animated_cells.setdefault(chunk, [])
+        if (col, row) in cells:
+            cells.remove((col, row))
+        if self.animated_lut[tile_id]:
+            cells.append((col, row))
+
+        surf = self.chunks.get(chunk)
+        if surf is not None:
+            size = self.tile_size * self.render_scale
+            cell_pos = ((col - chunk * CHUNK_COLUMNS) * size, row * size)
+            surf.fill((0, 0, 0, 0), pygame.Rect(cell_pos, (size, size)))
+            image = self.get_static_image(tile_id)
+            if image:
+                surf.blit(image, cell_pos)
+        # Other scales render the chunk again when they next draw it
+        for cache in self.render_caches.values():
+            cache["chunks"].pop(chunk, None)
+
+    def scroll_to(self, camera_x, scale=1):
+        # The whole level is in memory, StreamingLevel loads/evicts chunks here
+        pass
+
+    def reset(self):
+        # Back to the level as loaded
+        self.set_state(STATE_HEADER.pack(0, 0))
+
+    def get_state(self):
+        # Only cells changed since load are stored, as flat indices + tile ids
+        edited = np.array(sorted(self.edited_cells), dtype=np.uint32)
+        tiles = self.grid.ravel()[edited]
+        differs = tiles != self.initial_grid.ravel()[edited]
+        changed = edited[differs]
+        tiles = tiles[differs]
+        return STATE_HEADER.pack(self.animation_timer, len(changed)) + changed.tobytes() + tiles.tobytes()
+
+    def set_state(self, state):
+        self.animation_timer, count = STATE_HEADER.unpack_from(state)
+        offset = STATE_HEADER.size
+        changed = np.frombuffer(state, dtype=np.uint32, count=count, offset=offset)
+        tiles = np.frombuffer(state, dtype=self.grid.dtype, count=count, offset=offset + changed.nbytes)
+
+        # Only cells edited here or in the state can differ, set_tile() just the
+        # ones that actually do so derived data stays incremental
+        target = dict(zip(changed.tolist(), tiles.tolist()))
+        grid = self.grid.ravel()
+        initial = self.initial_grid.ravel()
+        for index in sorted(self.edited_cells.union(target)):
+            tile_id = target.get(index, initial[index])
+            if grid[index] != tile_id:
+                row, col = divmod(index, self.width)
+                self.set_tile(col, row, tile_id)
+        self.edited_cells = set(target)
+
+    def first_solid_cell(self, left, top, width, height, scale=1):
+        # (col, row) of the first solid cell the rect overlaps, scanning the
+        # rows top to bottom and each row left to right, or None
+        size = self.tile_size * scale
+        first_col = max(left // size, self.col_offset)
+        last_col = min((left + width - 1) // size, self.width - 1, self.col_offset + self.grid.shape[1] - 1)
+        first_row = max(top // size, 0)
+        last_row = min((top + height - 1) // size, self.height - 1)
+
+        if first_row > last_row or first_col > last_col:
+            return None
+        window = self.solid[first_row:last_row + 1, first_col - self.col_offset:last_col - self.col_offset + 1]
+        for row, cells in enumerate(window.tolist()):
+            for col, cell in enumerate(cells):
+                if cell:
+                    return first_col + col, first_row + row
+        return None
 
     def get_solid_tiles(self, scale=1):
-        solids = []
-        for row in range(self.height):
-            for col in range(self.width):
-                tile_id = self.grid[row][col]
-                tile_info = self.tileset.get(str(tile_id))
-                if tile_info and tile_info.get("solid"):
-                    rect = pygame.Rect(
-                        col * self.tile_size * scale,
-                        row * self.tile_size * scale,
-                        self.tile_size * scale,
-                        self.tile_size * scale
-                    )
-                    solids.append(rect)
-        return solids
\ No newline at end of file
+        size = self.tile_size * scale
+        rows, cols = np.nonzero(self.solid)
+        cols += self.col_offset
+        return [
+            pygame.Rect(col * size, row * size, size, size)
+            for row, col in zip(rows.tolist(), cols.tolist())
+        ]
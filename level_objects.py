@@ -0,0 +1,114 @@
+import math
+from bisect import bisect_left, bisect_right
+
+DEFAULT_OBJECT_ID = 10 # legacy [x] entries are flagpoles
+FLAGPOLE_ID = DEFAULT_OBJECT_ID
+
+# Trigger kinds returned by ObjectLayer.triggered()
+TRIGGER_FLAGPOLE = "flagpole"
+TRIGGER_PIT = "pit"
+
+
+def normalize_objects(entries):
+    # Level files mix legacy [x] / x flagpoles and [x, id] pairs
+    objects = []
+    for obj in entries:
+        if isinstance(obj, (list, tuple)):
+            objects.append((int(obj[0]), int(obj[1]) if len(obj) > 1 else DEFAULT_OBJECT_ID))
+        else:
+            objects.append((int(obj), DEFAULT_OBJECT_ID))
+    return objects
+
+
+class ObjectLayer:
+    # A level's objects (flagpoles, bushes, clouds, hills) as parallel lists
+    # sorted by column, so range queries, lookups and edits are a bisect.
+    # order is each object's position in the level file: drawing visible
+    # objects in that order keeps overlaps layered as they were authored.
+    def __init__(self, entries=()):
+        objects = normalize_objects(entries)
+        indices = sorted(range(len(objects)), key=lambda i: objects[i][0])
+        self.columns = [objects[i][0] for i in indices]
+        self.ids = [objects[i][1] for i in indices]
+        self.order = indices
+        self.next_order = len(objects)
+        self.triggers = []
+        self.trigger_lefts = []
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __iter__(self):
+        # (column, id), sorted by column
+        return zip(self.columns, self.ids)
+
+    def range(self, first_col, last_col):
+        # Indices of the objects in columns first_col..last_col
+        return range(bisect_left(self.columns, first_col), bisect_right(self.columns, last_col))
+
+    def find(self, col, obj_id):
+        for i in self.range(col, col):
+            if self.ids[i] == obj_id:
+                return i
+        return -1
+
+    def add(self, col, obj_id):
+        # False if the same object is already in that column
+        if self.find(col, obj_id) >= 0:
+            return False
+        i = bisect_right(self.columns, col)
+        self.columns.insert(i, col)
+        self.ids.insert(i, obj_id)
+        self.order.insert(i, self.next_order)
+        self.next_order += 1
+        return True
+
+    def remove(self, i):
+        del self.columns[i], self.ids[i], self.order[i]
+
+    def remove_column(self, col):
+        # Every object in col, returns how many were removed
+        span = self.range(col, col)
+        del self.columns[span.start:span.stop], self.ids[span.start:span.stop], self.order[span.start:span.stop]
+        return len(span)
+
+    def nearest(self, col):
+        # Index of the object closest to col, -1 when there are none
+        if not self.columns:
+            return -1
+        i = bisect_left(self.columns, col)
+        if i == len(self.columns) or (i > 0 and col - self.columns[i - 1] <= self.columns[i] - col):
+            return i - 1
+        return i
+
+    def columns_of(self, obj_id):
+        return [col for col, i in zip(self.columns, self.ids) if i == obj_id]
+
+    def to_list(self):
+        # [[x, id], ...] in file order, for saving
+        return [[self.columns[i], self.ids[i]] for i in sorted(range(len(self.columns)), key=self.order.__getitem__)]
+
+    # --- Triggers ---
+    def build_triggers(self, tile_size, height):
+        # Volumes in unscaled pixels: (left, right, top, kind). A volume fires
+        # for a hitbox whose x-range touches [left, right] and whose top edge
+        # is below top. Sorted by left so a query only looks at volumes that
+        # start left of the hitbox.
+        triggers = [(-math.inf, math.inf, height * tile_size, TRIGGER_PIT)]
+        # Everything right of a flagpole counts as having reached it
+        for col in self.columns_of(FLAGPOLE_ID):
+            triggers.append((col * tile_size, math.inf, -math.inf, TRIGGER_FLAGPOLE))
+        triggers.sort(key=lambda trigger: trigger[0])
+        self.triggers = triggers
+        self.trigger_lefts = [trigger[0] for trigger in triggers]
+
+    def triggered(self, left, right, top, scale=1):
+        # Kinds of the volumes the hitbox (scaled pixels) is in
+        kinds = []
+        # (+1 so rounding in the division can't drop a volume, the test below is exact)
+        for i in range(bisect_right(self.trigger_lefts, right / scale + 1)):
+            vol_left, vol_right, vol_top, kind = self.triggers[i]
+            # Compared in scaled pixels so the result is exact
+            if vol_left * scale <= right and vol_right * scale >= left and top > vol_top * scale and kind not in kinds:
+                kinds.append(kind)
+        return kinds
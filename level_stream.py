@@ -0,0 +1,138 @@
+import numpy as np
+import struct
+from level_format import load_level_data
+from level_loader import Level, CHUNK_COLUMNS, max_tile_id
+
+# Chunks kept in memory: one behind the camera, the screen and lookahead
+# for enemy activation / tile observations
+WINDOW_CHUNKS = 5
+CHUNKS_BEHIND = 1
+
+# Generated levels are endless until the generator returns None
+ENDLESS_WIDTH = 2 ** 31 - 1
+DEFAULT_HEIGHT = 15
+
+# animation_timer, first loaded chunk, level width, then the window tiles
+STATE_HEADER = struct.Struct("<dIQ")
+
+
+class StreamingLevel(Level):
+    # Level that only keeps WINDOW_CHUNKS chunks of columns around the camera.
+    # source is either a level file (binary .mlvl levels are memory-mapped, so
+    # only the columns that get streamed in are read) or a callable
+    # generate(chunk) returning a (height, CHUNK_COLUMNS) array of tile ids,
+    # fewer columns for the last chunk or None once the level is over.
+    # Chunks behind the camera are dropped for good, the camera never scrolls
+    # left, so memory and per-step cost stay the same however long the level is.
+    def __init__(self, source, tileset_path, load_images=True, height=DEFAULT_HEIGHT,
+                 window_chunks=WINDOW_CHUNKS):
+        self.window_chunks = window_chunks
+
+        if callable(source):
+            self.generate = source
+            self.source_tiles = None
+            self.source_width = ENDLESS_WIDTH
+            self.height = height
+            self.enemies = []
+            self.load_tileset(tileset_path)
+            self.load_objects([])
+        else:
+            level_data = load_level_data(source, tileset_path)
+            self.generate = None
+            self.source_width = level_data["width"]
+            self.height = level_data["height"]
+            self.enemies = level_data.get("objects", {}).get("enemies", [])
+
+            tiles = level_data["tiles"]
+            if not isinstance(tiles, np.ndarray):
+                tiles = np.asarray(tiles, dtype=np.int64)
+            self.source_tiles = tiles.reshape(self.height, self.source_width)
+            self.load_tileset(tileset_path, max_tile_id(self.source_tiles))
+            self.load_objects(level_data.get("objects", {}).get("flagpoles", []))
+
+        self.width = self.source_width
+        self.grid = np.zeros((self.height, window_chunks * CHUNK_COLUMNS), dtype=self.grid_dtype)
+        self.solid = np.zeros(self.grid.shape, dtype=bool)
+        # Written by set_tile() but unused, get_state() stores the whole window
+        self.edited_cells = set()
+        self.first_chunk = 0
+        self.col_offset = 0
+        self.interactive_blocks = True
+
+        self.setup_images(load_images)
+        self.load_window(0)
+
+    def read_chunk(self, chunk):
+        block = np.zeros((self.height, CHUNK_COLUMNS), dtype=self.grid_dtype)
+        first_col = chunk * CHUNK_COLUMNS
+        if first_col >= self.width:
+            return block
+
+        if self.source_tiles is not None:
+            tiles = self.source_tiles[:, first_col:first_col + CHUNK_COLUMNS]
+        else:
+            tiles = self.generate(chunk)
+            if tiles is None:
+                self.width = first_col
+                return block
+            tiles = np.asarray(tiles).reshape(self.height, -1)[:, :CHUNK_COLUMNS]
+            if tiles.shape[1] < CHUNK_COLUMNS:
+                self.width = first_col + tiles.shape[1]
+
+        block[:, :tiles.shape[1]] = tiles
+        return block
+
+    def forget_chunk(self, chunk):
+        if self.render_scale is not None:
+            self.forget_chunk_images(chunk)
+            self.animated_cells.pop(chunk, None)
+
+    def load_window(self, first_chunk):
+        # Chunks still inside the new window are moved left, the rest are read
+        shift = first_chunk - self.first_chunk
+        kept = self.window_chunks - shift if 0 < shift < self.window_chunks else 0
+        for chunk in range(self.first_chunk, self.first_chunk + self.window_chunks):
+            if chunk < first_chunk or chunk >= first_chunk + kept:
+                self.forget_chunk(chunk)
+        if kept:
+            self.grid[:, :kept * CHUNK_COLUMNS] = self.grid[:, shift * CHUNK_COLUMNS:]
+
+        self.first_chunk = first_chunk
+        self.col_offset = first_chunk * CHUNK_COLUMNS
+        self.edited_cells = set()
+        for i in range(kept, self.window_chunks):
+            block = self.read_chunk(first_chunk + i)
+            self.grid[:, i * CHUNK_COLUMNS:(i + 1) * CHUNK_COLUMNS] = block
+            if self.render_scale is not None:
+                self.add_animated_cells(self.col_offset + i * CHUNK_COLUMNS, block)
+        np.take(self.solid_lut, self.grid, out=self.solid)
+
+    def scroll_to(self, camera_x, scale=1):
+        chunk_width = CHUNK_COLUMNS * self.tile_size * scale
+        first_chunk = max(int(camera_x // chunk_width) - CHUNKS_BEHIND, 0)
+        if first_chunk > self.first_chunk:
+            self.load_window(first_chunk)
+
+    def reset(self):
+        # Everything is read (or generated) again from chunk 0, so generators
+        # must return the same tiles for the same chunk
+        self.animation_timer = 0
+        self.width = self.source_width
+        self.load_window(0)
+
+    def get_state(self):
+        # The whole window is stored, it is only a few KB
+        header = STATE_HEADER.pack(self.animation_timer, self.first_chunk, self.width)
+        return header + self.grid.tobytes()
+
+    def set_state(self, state):
+        self.animation_timer, first_chunk, self.width = STATE_HEADER.unpack_from(state)
+        for chunk in range(self.first_chunk, self.first_chunk + self.window_chunks):
+            self.forget_chunk(chunk)
+        self.first_chunk = first_chunk
+        self.col_offset = first_chunk * CHUNK_COLUMNS
+        self.grid[:] = np.frombuffer(state, dtype=self.grid.dtype, count=self.grid.size,
+                                     offset=STATE_HEADER.size).reshape(self.grid.shape)
+        np.take(self.solid_lut, self.grid, out=self.solid)
+        if self.render_scale is not None:
+            self.add_animated_cells(self.col_offset, self.grid)
@@ -1,12 +1,16 @@
 import os
+import sys
 import pygame
-from sprite_manager import SpriteManager
-from level_loader import Level
-from mario import Mario
+from controls import CombinedSource, ControllerSource, KeyboardSource
+from dirty_render import DirtyRenderer
+from game_env import GameEnv, BASE_WIDTH, BASE_HEIGHT, FIXED_DT
+from mario import load_sounds
+from profiler import FrameProfiler, NULL_PROFILER
+from replay import ReplayRecorder
 
 pygame.init()
-pygame.mixer.init()
 pygame.joystick.init()
+load_sounds()
 
 controller = None
 if pygame.joystick.get_count() > 0:
@@ -14,12 +18,26 @@ if pygame.joystick.get_count() > 0:
     controller.init()
     print("Controller connected:", controller.get_name())
 
+# keyboard / controller state is kept up to date from events, nothing is polled per frame
+controls = CombinedSource(KeyboardSource(), ControllerSource(controller) if controller else None)
+
 SCALE = 3
-BASE_WIDTH, BASE_HEIGHT = 256, 240
 screen_width, screen_height = BASE_WIDTH * SCALE, BASE_HEIGHT * SCALE
 screen = pygame.display.set_mode((screen_width, screen_height))
 clock = pygame.time.Clock()
 FPS = 60
+MAX_STEPS_PER_FRAME = 5
+
+# python main.py --profile records per-phase timings, F3 toggles the overlay
+PROFILE = "--profile" in sys.argv[1:]
+PROFILE_TRACE_PATH = "profile_trace.json"
+
+# Only changed regions are redrawn and pushed to the display,
+# python main.py --full-redraw repaints and flips the whole screen every frame
+FULL_REDRAW = "--full-redraw" in sys.argv[1:]
+
+# python main.py --record replays.mrpl appends every episode to a replay log (see replay.py)
+RECORD_PATH = sys.argv[sys.argv.index("--record") + 1] if "--record" in sys.argv[1:-1] else None
 
 # music
 music_path = os.path.join("music", "overworld1_mario.ogg")
@@ -27,42 +45,66 @@ pygame.mixer.music.load(music_path)
 pygame.mixer.music.set_volume(0.5)
 pygame.mixer.music.play(-1)
 
-# sprites & level
-sprites = SpriteManager("sprites", SCALE)
-level = Level("levels/1-1.json", "tileset.json")
+# level & mario
+env = GameEnv("levels/1-1.json", "tileset.json", scale=SCALE, start_x=100 / SCALE)
+if RECORD_PATH:
+    env.recorder = ReplayRecorder(RECORD_PATH)
+    env.reset()
 
-# mario
-mario = Mario(x=100, y=0, scale=SCALE)
+renderer = DirtyRenderer(env, screen)
 
-camera_x = 0
+profiler = FrameProfiler() if PROFILE else NULL_PROFILER
+env.profiler = profiler
+show_overlay = PROFILE
+overlay_font = pygame.font.SysFont(None, 24) if PROFILE else None
+
+# physics always advances in FIXED_DT ticks, frame time just decides how many
+accumulator = 0.0
 
 running = True
 while running:
     dt = clock.tick(FPS) / 1000
+    accumulator = min(accumulator + dt, MAX_STEPS_PER_FRAME * FIXED_DT)
+    profiler.begin_frame()
 
     for event in pygame.event.get():
+        controls.handle_event(event)
         if event.type == pygame.QUIT:
             running = False
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and PROFILE:
+            show_overlay = not show_overlay
 
-    keys = pygame.key.get_pressed()
-
-    mario.handle_input(keys, controller)
-    solid_tiles = level.get_solid_tiles(SCALE)
-    mario.update(dt, camera_x, solid_tiles)
-
-    # camera logic
-    if mario.x - camera_x > screen_width // 2:
-        camera_x = mario.x - screen_width // 2
-        level_pixel_width = level.width * level.tile_size * SCALE
-        if camera_x > level_pixel_width - screen_width:
-            camera_x = level_pixel_width - screen_width
+    action = controls.poll()
+    profiler.mark("input")
+    while accumulator >= FIXED_DT:
+        env.step(action)
+        accumulator -= FIXED_DT
+        if env.is_over():
+            # Like GameEnv.step's frame skip: no ticks after the episode ends
+            env.reset()
+            accumulator = 0.0
+            break
 
     # draw
-    screen.fill((92, 148, 252))
-    
-    level.draw(screen, dt, camera_x, SCALE)
-    mario.draw(screen, sprites, camera_x, dt)
+    if FULL_REDRAW or show_overlay:
+        env.render(screen, dt)
+        if show_overlay:
+            profiler.draw_overlay(screen, overlay_font)
+        renderer.invalidate()
+        pygame.display.flip()
+    else:
+        dirty_rects = renderer.render(dt)
+        if dirty_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
+    profiler.mark("flip")
+    profiler.end_frame()
+
+env.close()
 
-    pygame.display.flip()
+if PROFILE:
+    profiler.dump_chrome_trace(PROFILE_TRACE_PATH)
+    print("Profile trace written to", PROFILE_TRACE_PATH)
 
-pygame.quit()
\ No newline at end of file
+pygame.quit()
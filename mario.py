@@ -1,12 +1,22 @@
 import pygame
 import math
 import os
+import struct
+from controls import LEFT, RIGHT, JUMP
 
-pygame.mixer.init()
-pygame.mixer.set_num_channels(16)
+# sound is optional so headless simulation never touches the mixer
+jump_sound = None
 
-jump_sound = pygame.mixer.Sound(os.path.join("sfx", "jump_effect.ogg"))
-jump_sound.set_volume(0.1)
+def load_sounds():
+    global jump_sound
+    pygame.mixer.init()
+    pygame.mixer.set_num_channels(16)
+
+    jump_sound = pygame.mixer.Sound(os.path.join("sfx", "jump_effect.ogg"))
+    jump_sound.set_volume(0.1)
+
+# x, y, velocity_x, velocity_y, flags (on_ground, z_was_pressed, facing right)
+STATE_FORMAT = struct.Struct("<ddddB")
 
 class Mario:
     def __init__(self, x, y, scale):
@@ -41,40 +51,12 @@ class Mario:
                            int(self.width * self.scale), 
                            int(self.height * self.scale))
 
-    def handle_input(self, keys, controller=None):
-        self.velocity_x = 0
+    def apply_action(self, action):
+        # action is a controls bitmask (LEFT | RIGHT | JUMP ...)
+        self.apply_input(action & LEFT, action & RIGHT, action & JUMP)
 
-        move_left = False
-        move_right = False
-        jump_pressed = False
-
-        # --- KEYBOARD ---
-        if keys[pygame.K_RIGHT]:
-            move_right = True
-        if keys[pygame.K_LEFT]:
-            move_left = True
-        if keys[pygame.K_z]:
-            jump_pressed = True
-
-        # --- CONTROLLER ---
-        if controller:
-            # D-Pad (mapped as buttons on your system)
-            if controller.get_button(13):  # D-pad left
-                move_left = True
-            if controller.get_button(14):  # D-pad right
-                move_right = True
-
-            # Left joystick
-            if controller.get_numaxes() > 0:
-                axis_x = controller.get_axis(0)
-                if axis_x < -0.5:
-                    move_left = True
-                if axis_x > 0.5:
-                    move_right = True
-
-            # A button only
-            if controller.get_button(0):  # A
-                jump_pressed = True
+    def apply_input(self, move_left, move_right, jump_pressed):
+        self.velocity_x = 0
 
         # --- APPLY MOVEMENT ---
         if move_right:
@@ -90,7 +72,8 @@ class Mario:
                 self.velocity_y = self.jump_force
                 self.on_ground = False
                 self.y -= 2 
-                jump_sound.play()
+                if jump_sound:
+                    jump_sound.play()
                 
             self.z_was_pressed = True
         else:
@@ -98,48 +81,57 @@ class Mario:
                 self.velocity_y = self.min_jump_velocity
             self.z_was_pressed = False
 
-    def update(self, dt, camera_x, solid_tiles):
+    def update(self, dt, camera_x, level):
+        width = int(self.width * self.scale)
+        height = int(self.height * self.scale)
+        size = level.tile_size * self.scale
+
         self.x += self.velocity_x * dt
 
         if self.x < camera_x:
             self.x = float(camera_x)
 
-        mario_rect = self.rect()
-        for tile in solid_tiles:
-            if mario_rect.colliderect(tile):
-                if self.velocity_x > 0:
-                    self.x = float(tile.left - mario_rect.width)
-                elif self.velocity_x < 0:
-                    self.x = float(tile.right)
-                self.velocity_x = 0
-                mario_rect = self.rect()
+        # Once a tile stops mario the others can't move him any more, so each
+        # pass only needs the first solid cell under the hitbox (row-major)
+        cell = level.first_solid_cell(int(self.x), int(self.y), width, height, self.scale)
+        if cell is not None:
+            col, row = cell
+            if self.velocity_x > 0:
+                self.x = float(col * size - width)
+            elif self.velocity_x < 0:
+                self.x = float((col + 1) * size)
+            self.velocity_x = 0
 
         self.velocity_y += self.gravity * dt
         if self.velocity_y > self.terminal_velocity:
             self.velocity_y = self.terminal_velocity
         self.y += self.velocity_y * dt
         
-        mario_rect = self.rect()
-        for tile in solid_tiles:
-            if mario_rect.colliderect(tile):
-                if self.velocity_y > 0: 
-                    self.y = float(tile.top - mario_rect.height)
-                    self.velocity_y = 0
-                elif self.velocity_y < 0: 
-                    self.y = float(tile.bottom)
-                    self.velocity_y = 0
-                mario_rect = self.rect()
-
-        ground_sensor = pygame.Rect(int(self.x), int(self.y + 1), 
-                                   int(self.width * self.scale), 
-                                   int(self.height * self.scale))
-        
-        self.on_ground = False
-        for tile in solid_tiles:
-            if ground_sensor.colliderect(tile):
-                self.on_ground = True
-                break
-
+        cell = level.first_solid_cell(int(self.x), int(self.y), width, height, self.scale)
+        if cell is not None:
+            col, row = cell
+            if self.velocity_y > 0: 
+                self.y = float(row * size - height)
+                self.velocity_y = 0
+            elif self.velocity_y < 0: 
+                self.y = float((row + 1) * size)
+                self.velocity_y = 0
+                self.bump(level, col, row)
+
+        # Ground sensor, one pixel below the hitbox
+        self.on_ground = level.first_solid_cell(int(self.x), int(self.y + 1), width, height, self.scale) is not None
+
+        self.update_animation()
+
+    def bump(self, level, col, row):
+        # Of the blocks above his head, the one under his center gets hit
+        size = level.tile_size * self.scale
+        center_x = int(self.x) + (self.width * self.scale) // 2
+        if level.first_solid_cell(center_x, row * size, 1, 1, self.scale) is not None:
+            col = center_x // size
+        level.bump_tile(col, row)
+
+    def update_animation(self):
         if not self.on_ground:
             self.current_animation = f"jump {self.direction}"
         elif self.velocity_x != 0:
@@ -147,12 +139,30 @@ class Mario:
         else:
             self.current_animation = f"idle {self.direction}"
 
-    def draw(self, screen, sprites, camera_x, dt):
-        frame = sprites.get_frame(self.current_animation, dt)
-        diff_x = (frame.get_width() - (self.width * self.scale)) // 2
+    def get_state(self):
+        flags = self.on_ground | (self.z_was_pressed << 1) | ((self.direction == "right") << 2)
+        return STATE_FORMAT.pack(self.x, self.y, self.velocity_x, self.velocity_y, flags)
+
+    def set_state(self, state):
+        self.x, self.y, self.velocity_x, self.velocity_y, flags = STATE_FORMAT.unpack(state)
+        self.on_ground = bool(flags & 1)
+        self.z_was_pressed = bool(flags & 2)
+        self.direction = "right" if flags & 4 else "left"
+        self.update_animation()
+
+    def draw(self, screen, animator, camera_x, dt, scale=None):
+        # animator is the renderer's sprite_manager.Animator for this mario.
+        # scale lets off-screen renderers draw at another resolution than the
+        # physics runs at, camera_x is then given in that resolution too
+        if scale is None:
+            scale = self.scale
+        ratio = scale / self.scale
+
+        frame = animator.get_frame(self.current_animation, dt)
+        diff_x = (frame.get_width() - (self.width * scale)) // 2
         img_height = frame.get_height()
-        hitbox_bottom = self.y + (self.height * self.scale)
+        hitbox_bottom = self.y * ratio + (self.height * scale)
         
-        draw_x = int(self.x - camera_x - diff_x)
-        draw_y = int(hitbox_bottom - img_height) + 1 * self.scale
-        screen.blit(frame, (draw_x, draw_y))
\ No newline at end of file
+        draw_x = int(self.x * ratio - camera_x - diff_x)
+        draw_y = int(hitbox_bottom - img_height) + 1 * scale
+        return screen.blit(frame, (draw_x, draw_y))
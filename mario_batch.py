@@ -0,0 +1,163 @@
+import numpy as np
+from controls import unpack_actions
+from mario import Mario, STATE_FORMAT
+
+# Screen width the camera follows mario in, unscaled (game_env.BASE_WIDTH)
+VIEW_WIDTH = 256
+
+
+class MarioBatch:
+    # N Marios on one level as structure-of-arrays. apply_actions() and
+    # update() do exactly what Mario.apply_input() / Mario.update() do for
+    # each of them, float64 op for op, so trajectories match the scalar
+    # Mario. Collisions gather the few cells under every hitbox from
+    # level.solid at once instead of building pygame Rects.
+    # Blocks are never bumped: the level is shared by every agent, so one
+    # breaking a brick would change it for all of them. Results match Mario
+    # on levels with interactive_blocks = False (or without bricks and
+    # question blocks).
+    def __init__(self, count, x, y, scale):
+        self.count = count
+        self.scale = scale
+
+        # Constants come from a real Mario so the two can never drift apart
+        template = Mario(0, 0, scale)
+        self.width = int(template.width * scale)
+        self.height = int(template.height * scale)
+        self.gravity = template.gravity
+        self.jump_force = template.jump_force
+        self.min_jump_velocity = template.min_jump_velocity
+        self.terminal_velocity = template.terminal_velocity
+        self.horizontal_speed = template.horizontal_speed
+
+        self.start_x = float(x)
+        self.start_y = float(y)
+        self.reset()
+
+    def reset(self, mask=None):
+        # All agents, or only the ones where mask is True
+        if mask is None:
+            mask = np.ones(self.count, dtype=bool)
+            self.x = np.zeros(self.count, dtype=np.float64)
+            self.y = np.zeros(self.count, dtype=np.float64)
+            self.velocity_x = np.zeros(self.count, dtype=np.float64)
+            self.velocity_y = np.zeros(self.count, dtype=np.float64)
+            self.on_ground = np.zeros(self.count, dtype=bool)
+            self.z_was_pressed = np.zeros(self.count, dtype=bool)
+            self.facing_right = np.zeros(self.count, dtype=bool)
+            self.camera_x = np.zeros(self.count, dtype=np.float64)
+        self.x[mask] = self.start_x
+        self.y[mask] = self.start_y
+        self.velocity_x[mask] = 0
+        self.velocity_y[mask] = 0
+        self.on_ground[mask] = False
+        self.z_was_pressed[mask] = False
+        self.facing_right[mask] = True
+        self.camera_x[mask] = 0
+
+    def apply_actions(self, actions):
+        # actions: one controls bitmask per agent (or one for all of them)
+        move_left, move_right, jump_pressed = unpack_actions(np.broadcast_to(actions, (self.count,)))
+
+        # --- APPLY MOVEMENT ---
+        speed = self.horizontal_speed
+        self.velocity_x = np.where(move_right, speed, np.where(move_left, -speed, 0)).astype(np.float64)
+        self.facing_right = np.where(move_right, True, np.where(move_left, False, self.facing_right))
+
+        # --- JUMP LOGIC ---
+        jump = jump_pressed & ~self.z_was_pressed & self.on_ground
+        self.velocity_y[jump] = self.jump_force
+        self.on_ground[jump] = False
+        self.y[jump] -= 2
+        released = ~jump_pressed & (self.velocity_y < self.min_jump_velocity)
+        self.velocity_y[released] = self.min_jump_velocity
+        self.z_was_pressed = jump_pressed
+
+    def first_solid(self, level, left, top):
+        # Mario.update() resolves against the first overlapping tile in
+        # row-major order, once a tile stops him the rest don't move him.
+        # Returns (hit, row, col) of that tile for each hitbox.
+        size = level.tile_size * self.scale
+        w, h = self.width, self.height
+        first_row, last_row = top // size, (top + h - 1) // size
+        first_col, last_col = left // size, (left + w - 1) // size
+        # Out-of-level (or not streamed in) cells are never solid
+        col_end = min(level.width, level.col_offset + level.grid.shape[1])
+        solid = level.solid.ravel()
+        grid_width = level.grid.shape[1]
+
+        hit = np.zeros(len(left), dtype=bool)
+        hit_row = np.zeros(len(left), dtype=np.int64)
+        hit_col = np.zeros(len(left), dtype=np.int64)
+        for dr in range((size + h - 2) // size + 1):
+            rows = first_row + dr
+            for dc in range((size + w - 2) // size + 1):
+                cols = first_col + dc
+                inside = ((rows <= last_row) & (cols <= last_col) & (rows >= 0) & (rows < level.height) &
+                          (cols >= level.col_offset) & (cols < col_end))
+                index = np.where(inside, rows * grid_width + cols - level.col_offset, 0)
+                new = inside & ~hit & solid[index]
+                hit |= new
+                hit_row[new] = rows[new]
+                hit_col[new] = cols[new]
+        return hit, hit_row, hit_col
+
+    def update(self, dt, camera_x, level):
+        # camera_x: scalar or one per agent
+        size = level.tile_size * self.scale
+        w, h = self.width, self.height
+
+        # --- Horizontal ---
+        self.x += self.velocity_x * dt
+        np.maximum(self.x, camera_x, out=self.x)
+
+        hit, _, col = self.first_solid(level, self.x.astype(np.int64), self.y.astype(np.int64))
+        self.x = np.where(hit & (self.velocity_x > 0), (col * size - w).astype(np.float64), self.x)
+        self.x = np.where(hit & (self.velocity_x < 0), ((col + 1) * size).astype(np.float64), self.x)
+        self.velocity_x[hit] = 0
+
+        # --- Vertical ---
+        self.velocity_y += self.gravity * dt
+        np.minimum(self.velocity_y, self.terminal_velocity, out=self.velocity_y)
+        self.y += self.velocity_y * dt
+
+        hit, row, _ = self.first_solid(level, self.x.astype(np.int64), self.y.astype(np.int64))
+        self.y = np.where(hit & (self.velocity_y > 0), (row * size - h).astype(np.float64), self.y)
+        self.y = np.where(hit & (self.velocity_y < 0), ((row + 1) * size).astype(np.float64), self.y)
+        self.velocity_y[hit] = 0
+
+        # --- Ground sensor, one pixel below the hitbox ---
+        self.on_ground, _, _ = self.first_solid(level, self.x.astype(np.int64), (self.y + 1).astype(np.int64))
+
+    def update_camera(self, level, view_width=None):
+        # GameEnv.update_camera() for every agent
+        if view_width is None:
+            view_width = VIEW_WIDTH * self.scale
+        follow = self.x - self.camera_x > view_width // 2
+        level_pixel_width = level.width * level.tile_size * self.scale
+        camera_x = np.minimum(self.x - view_width // 2, level_pixel_width - view_width)
+        self.camera_x = np.where(follow, camera_x, self.camera_x)
+
+    def step(self, actions, dt, level):
+        # One GameEnv tick for every agent, without enemies
+        self.apply_actions(actions)
+        self.update(dt, self.camera_x, level)
+        self.update_camera(level)
+
+    def fell_out(self, level):
+        return self.y > level.height * level.tile_size * self.scale
+
+    def get_state(self, index):
+        # Same bytes as Mario.get_state(), so agents can move between the two
+        flags = (int(self.on_ground[index]) | (int(self.z_was_pressed[index]) << 1) |
+                 (int(self.facing_right[index]) << 2))
+        return STATE_FORMAT.pack(self.x[index], self.y[index], self.velocity_x[index],
+                                 self.velocity_y[index], flags)
+
+    def set_state(self, index, state):
+        x, y, velocity_x, velocity_y, flags = STATE_FORMAT.unpack(state)
+        self.x[index], self.y[index] = x, y
+        self.velocity_x[index], self.velocity_y[index] = velocity_x, velocity_y
+        self.on_ground[index] = bool(flags & 1)
+        self.z_was_pressed[index] = bool(flags & 2)
+        self.facing_right[index] = bool(flags & 4)
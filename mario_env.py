@@ -0,0 +1,225 @@
+import struct
+import numpy as np
+from controls import NOOP, LEFT, RIGHT, JUMP
+from game_env import GameEnv
+from level_objects import TRIGGER_FLAGPOLE, TRIGGER_PIT
+from observation import TileObservation, MARIO_STATE_SIZE, ENEMY
+from pixel_observation import PixelObservation
+
+try:
+    import gymnasium as gym
+    from gymnasium import spaces
+except ImportError:
+    gym = None
+    spaces = None
+
+# Discrete action index -> controls bitmask
+ACTIONS = [
+    NOOP,
+    RIGHT,
+    RIGHT | JUMP,
+    JUMP,
+    LEFT,
+    LEFT | JUMP,
+]
+
+# x, y, velocity_x, velocity_y (all in unscaled pixels) and on_ground
+OBS_SIZE = 5
+
+OBS_TYPES = ("state", "tiles", "pixels")
+
+
+def alloc_obs(spec, num_envs):
+    # spec is (shape, dtype) or a dict of them for dict observations
+    if isinstance(spec, dict):
+        return {name: alloc_obs(field, num_envs) for name, field in spec.items()}
+    shape, dtype = spec
+    return np.zeros((num_envs,) + shape, dtype=dtype)
+
+
+def alloc_buffers(obs_spec, num_envs):
+    return {
+        "observations": alloc_obs(obs_spec, num_envs),
+        "rewards": np.zeros(num_envs, dtype=np.float32),
+        "terminated": np.zeros(num_envs, dtype=bool),
+        "truncated": np.zeros(num_envs, dtype=bool),
+    }
+
+
+def obs_row(obs, i):
+    if isinstance(obs, dict):
+        return {name: field[i] for name, field in obs.items()}
+    return obs[i]
+
+
+def copy_obs(obs):
+    if isinstance(obs, dict):
+        return {name: field.copy() for name, field in obs.items()}
+    return obs.copy()
+
+
+class MarioEnv(gym.Env if gym else object):
+    metadata = {"render_modes": ["rgb_array"], "render_fps": 60}
+
+    def __init__(self, level_path="levels/1-1.json", tileset_path="tileset.json",
+                 max_steps=3000, render_mode=None, obs_type="state", pixel_kwargs=None,
+                 **env_kwargs):
+        if obs_type not in OBS_TYPES:
+            raise ValueError(f"Unknown obs_type {obs_type!r}, expected one of {OBS_TYPES}")
+
+        self.game = GameEnv(level_path, tileset_path, **env_kwargs)
+        self.obs_type = obs_type
+        self.max_steps = max_steps
+        self.render_mode = render_mode
+        self.steps = 0
+        self.np_random = np.random.default_rng()
+
+        if obs_type == "tiles":
+            self.tile_obs = TileObservation(self.game.level)
+            self.obs_spec = {
+                "tiles": (self.tile_obs.shape, np.uint8),
+                "mario": ((MARIO_STATE_SIZE,), np.float32),
+            }
+        elif obs_type == "pixels":
+            self.pixel_obs = PixelObservation(self.game, **(pixel_kwargs or {}))
+            self.obs_spec = (self.pixel_obs.shape, np.uint8)
+        else:
+            self.obs_spec = ((OBS_SIZE,), np.float32)
+
+        if spaces:
+            self.action_space = spaces.Discrete(len(ACTIONS))
+            if obs_type == "tiles":
+                self.observation_space = spaces.Dict({
+                    "tiles": spaces.Box(0, ENEMY, shape=self.tile_obs.shape, dtype=np.uint8),
+                    "mario": spaces.Box(-np.inf, np.inf, shape=(MARIO_STATE_SIZE,), dtype=np.float32),
+                })
+            elif obs_type == "pixels":
+                self.observation_space = spaces.Box(0, 255, shape=self.pixel_obs.shape, dtype=np.uint8)
+            else:
+                self.observation_space = spaces.Box(-np.inf, np.inf, shape=(OBS_SIZE,), dtype=np.float32)
+
+    def get_obs(self, out=None):
+        if out is None:
+            out = obs_row(alloc_obs(self.obs_spec, 1), 0)
+
+        if self.obs_type == "tiles":
+            camera_x, scale = self.game.camera_x, self.game.scale
+            self.tile_obs.observe_tiles(camera_x, scale, out["tiles"])
+            first_col = self.tile_obs.window_start(camera_x, scale)
+            self.game.enemies.mark_cells(out["tiles"], first_col, ENEMY)
+            self.tile_obs.observe_mario(self.game.mario, camera_x, scale, out["mario"])
+            return out
+        if self.obs_type == "pixels":
+            return self.pixel_obs.observe(out)
+
+        mario = self.game.mario
+        scale = self.game.scale
+        out[0] = mario.x / scale
+        out[1] = mario.y / scale
+        out[2] = mario.velocity_x / scale
+        out[3] = mario.velocity_y / scale
+        out[4] = mario.on_ground
+        return out
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+        self.game.reset()
+        self.steps = 0
+        if self.obs_type == "pixels":
+            self.pixel_obs.reset()
+        return self.get_obs(), {}
+
+    def step(self, action):
+        reward, terminated, truncated, info = self.advance(action)
+        return self.get_obs(), reward, terminated, truncated, info
+
+    def advance(self, action):
+        # step() without building an observation, batched callers write their own
+        prev_x = self.game.mario.x
+        self.game.step(ACTIONS[int(action)])
+        self.steps += 1
+        if self.obs_type == "pixels":
+            self.pixel_obs.step()
+
+        reward = (self.game.mario.x - prev_x) / self.game.scale
+        triggers = self.game.triggers()
+        fell = TRIGGER_PIT in triggers
+        flag = TRIGGER_FLAGPOLE in triggers
+        killed = self.game.dead
+        terminated = fell or flag or killed
+        truncated = not terminated and self.steps >= self.max_steps
+        info = {"x": self.game.mario.x / self.game.scale, "fell": fell, "flag": flag, "killed": killed}
+        return float(reward), terminated, truncated, info
+
+    def get_state(self):
+        return struct.pack("<Q", self.steps) + self.game.get_state()
+
+    def set_state(self, state):
+        (self.steps,) = struct.unpack_from("<Q", state)
+        self.game.set_state(state[8:])
+
+    def render(self):
+        if self.render_mode == "rgb_array":
+            import pygame
+            return pygame.surfarray.array3d(self.game.render()).transpose(1, 0, 2)
+        return None
+
+    def close(self):
+        if self.obs_type == "pixels":
+            self.pixel_obs.close()
+        self.game.close()
+
+
+class MarioVectorEnv:
+    # Steps N independent MarioEnv instances per call and returns stacked arrays.
+    # Finished sub-envs are reset automatically, the final observation is kept in infos.
+    # buffers lets callers (e.g. rollout workers) pass in the output arrays to write to.
+    def __init__(self, num_envs, buffers=None, **env_kwargs):
+        self.num_envs = num_envs
+        self.envs = [MarioEnv(**env_kwargs) for _ in range(num_envs)]
+
+        if buffers is None:
+            buffers = alloc_buffers(self.envs[0].obs_spec, num_envs)
+        self.observations = buffers["observations"]
+        self.rewards = buffers["rewards"]
+        self.terminated = buffers["terminated"]
+        self.truncated = buffers["truncated"]
+
+        if spaces:
+            self.single_action_space = self.envs[0].action_space
+            self.single_observation_space = self.envs[0].observation_space
+            self.action_space = spaces.MultiDiscrete([len(ACTIONS)] * num_envs)
+
+    def reset(self, seed=None, options=None):
+        self.reset_into(seed)
+        return copy_obs(self.observations), {}
+
+    def reset_into(self, seed=None):
+        for i, env in enumerate(self.envs):
+            env.reset(seed=None if seed is None else seed + i)
+            env.get_obs(obs_row(self.observations, i))
+
+    def step(self, actions):
+        infos = self.step_into(actions)
+        return (copy_obs(self.observations), self.rewards.copy(),
+                self.terminated.copy(), self.truncated.copy(), infos)
+
+    def step_into(self, actions):
+        # Writes results into the buffers in place and only returns the infos
+        infos = []
+        for i, env in enumerate(self.envs):
+            reward, terminated, truncated, info = env.advance(actions[i])
+            if terminated or truncated:
+                info["final_observation"] = env.get_obs()
+                env.reset()
+            env.get_obs(obs_row(self.observations, i))
+            self.rewards[i] = reward
+            self.terminated[i] = terminated
+            self.truncated[i] = truncated
+            infos.append(info)
+        return infos
+
+    def close(self):
+        for env in self.envs:
+            env.close()
@@ -0,0 +1,70 @@
+import numpy as np
+
+# Tiles visible on one NES screen (256 px / 16 px)
+OBS_COLUMNS = 16
+
+# Tile classes seen by agents (ENEMY is drawn over the tiles)
+EMPTY, SOLID, BRICK, QUESTION, PIPE, ENEMY = range(6)
+
+# x (relative to the window), y, velocity_x, velocity_y in unscaled pixels and on_ground
+MARIO_STATE_SIZE = 5
+
+
+def build_tile_classes(level):
+    lut = np.zeros(len(level.solid_lut), dtype=np.uint8)
+    for tile_id, tile_data in level.tileset.items():
+        name = tile_data["name"]
+        if not tile_data.get("solid"):
+            tile_class = EMPTY
+        elif name == "brick":
+            tile_class = BRICK
+        elif name == "question_block":
+            tile_class = QUESTION
+        elif name.startswith("pipe"):
+            tile_class = PIPE
+        else:
+            tile_class = SOLID
+        lut[int(tile_id)] = tile_class
+    return lut
+
+
+class TileObservation:
+    # Symbolic view of the screen around the camera, taken straight from Level.grid
+    def __init__(self, level, columns=OBS_COLUMNS):
+        self.level = level
+        self.columns = columns
+        self.class_lut = build_tile_classes(level)
+
+        self.shape = (level.height, columns)
+        self.tiles = np.zeros(self.shape, dtype=np.uint8)
+        self.state = np.zeros(MARIO_STATE_SIZE, dtype=np.float32)
+
+    def window_start(self, camera_x, scale):
+        col = int(camera_x // (self.level.tile_size * scale))
+        return max(0, min(col, self.level.width - self.columns))
+
+    def tile_view(self, camera_x, scale):
+        # Raw tile ids, a view into the level array (no copy)
+        col = self.window_start(camera_x, scale) - self.level.col_offset
+        return self.level.grid[:, col:col + self.columns]
+
+    def observe_tiles(self, camera_x, scale, out=None):
+        if out is None:
+            out = self.tiles
+        view = self.tile_view(camera_x, scale)
+        visible = view.shape[1]
+        if visible < self.columns:
+            out[:, visible:] = EMPTY
+        np.take(self.class_lut, view, out=out[:, :visible], mode="clip")
+        return out
+
+    def observe_mario(self, mario, camera_x, scale, out=None):
+        if out is None:
+            out = self.state
+        left = self.window_start(camera_x, scale) * self.level.tile_size * scale
+        out[0] = (mario.x - left) / scale
+        out[1] = mario.y / scale
+        out[2] = mario.velocity_x / scale
+        out[3] = mario.velocity_y / scale
+        out[4] = mario.on_ground
+        return out
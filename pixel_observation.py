@@ -0,0 +1,93 @@
+import numpy as np
+import pygame
+from game_env import BASE_WIDTH, BASE_HEIGHT, SKY_COLOR
+from sprite_manager import SpriteManager, Animator
+
+# Integer luminance weights (sum to 256)
+GRAY_WEIGHTS = np.array([77, 150, 29], dtype=np.uint16)
+
+
+class PixelObservation:
+    # Renders a GameEnv off-screen at native NES resolution (scale 1), whatever
+    # scale the physics runs at, and turns the frame into agent observations.
+    def __init__(self, game, grayscale=True, size=(84, 84), frame_stack=4):
+        self.game = game
+        self.grayscale = grayscale
+        self.size = size
+        self.frame_stack = frame_stack
+
+        self.surface = pygame.Surface((BASE_WIDTH, BASE_HEIGHT))
+        self.sprites = SpriteManager("sprites", 1)
+        self.mario_animator = Animator(self.sprites)
+        # Game tick of the last render, mario's animation advances by the
+        # ticks simulated since then
+        self.last_frame = 0
+
+        # Nearest-neighbour sample positions, computed once
+        height, width = size if size else (BASE_HEIGHT, BASE_WIDTH)
+        self.sample_cols = (np.arange(width) * BASE_WIDTH) // width
+        self.sample_rows = (np.arange(height) * BASE_HEIGHT) // height
+
+        frame_shape = (height, width) if grayscale else (height, width, 3)
+        self.frame_buffer = np.zeros(frame_shape, dtype=np.uint8)
+
+        # Ring buffer of the last k processed frames, pos is the newest one
+        self.stack = np.zeros((frame_stack,) + frame_shape, dtype=np.uint8)
+        self.pos = 0
+        self.shape = (frame_stack,) + frame_shape if frame_stack > 1 else frame_shape
+
+    def render(self):
+        game = self.game
+        camera_x = game.camera_x / game.scale
+        # Animation time comes from the game tick, so observing doesn't
+        # advance the level's clock and frame skip doesn't slow animations
+        elapsed = max(game.frame - self.last_frame, 0) * game.dt
+        self.last_frame = game.frame
+        self.surface.fill(SKY_COLOR)
+        game.level.draw(self.surface, 0, camera_x, 1, animation_time=game.frame * game.dt)
+        game.enemies.draw(self.surface, camera_x, 1)
+        game.mario.draw(self.surface, self.mario_animator, camera_x, elapsed, scale=1)
+        return self.surface
+
+    def frame_view(self):
+        # (height, width, 3) view of the surface pixels, no copy. The surface stays
+        # locked while the array is alive, so drop it before the next render().
+        return pygame.surfarray.pixels3d(self.surface).transpose(1, 0, 2)
+
+    def process(self, out=None):
+        if out is None:
+            out = self.frame_buffer
+        pixels = pygame.surfarray.pixels3d(self.surface)
+        if self.size:
+            # surfarray is indexed [x, y], sample before any per-pixel math
+            pixels = pixels[self.sample_cols[:, None], self.sample_rows]
+        if self.grayscale:
+            out[...] = (pixels @ GRAY_WEIGHTS >> 8).T
+        else:
+            out[...] = pixels.transpose(1, 0, 2)
+        del pixels
+        return out
+
+    def reset(self):
+        self.render()
+        frame = self.process()
+        self.stack[:] = frame
+        self.pos = 0
+        return self.observe()
+
+    def step(self):
+        self.render()
+        self.pos = (self.pos + 1) % self.frame_stack
+        self.process(self.stack[self.pos])
+        return self.observe()
+
+    def observe(self, out=None):
+        if self.frame_stack == 1:
+            index = 0
+        else:
+            # oldest to newest
+            index = (self.pos + 1 + np.arange(self.frame_stack)) % self.frame_stack
+        return np.take(self.stack, index, axis=0, out=out)
+
+    def close(self):
+        self.sprites.close()
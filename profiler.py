@@ -0,0 +1,105 @@
+import json
+import time
+import numpy as np
+
+# Phases of one frame in main.py, in the order they run
+FRAME_PHASES = ("input", "update", "enemies", "camera", "clear", "level_draw", "enemy_draw", "mario_draw", "flip")
+OVERLAY_REFRESH_FRAMES = 30
+
+
+class FrameProfiler:
+    # Per-phase frame timings in a fixed-size ring buffer. There is a single
+    # writer (the game loop) and readers only look at rows below self.count,
+    # so no locking is needed.
+    enabled = True
+
+    def __init__(self, phases=FRAME_PHASES, capacity=600):
+        self.phases = list(phases)
+        self.phase_index = {name: i for i, name in enumerate(self.phases)}
+        self.capacity = capacity
+
+        self.samples = np.zeros((capacity, len(self.phases)), dtype=np.float64)
+        self.frame_starts = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+
+        self.current = np.zeros(len(self.phases), dtype=np.float64)
+        self.frame_start = 0.0
+        self.last = 0.0
+        self.overlay = []
+
+    def begin_frame(self):
+        self.current[:] = 0.0
+        self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        # Time since the previous mark is charged to phase (phases can repeat)
+        now = time.perf_counter()
+        self.current[self.phase_index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        row = self.count % self.capacity
+        self.samples[row] = self.current
+        self.frame_starts[row] = self.frame_start
+        self.count += 1
+
+    def recent(self):
+        # Rows in chronological order
+        filled = min(self.count, self.capacity)
+        if self.count <= self.capacity:
+            return self.samples[:filled], self.frame_starts[:filled]
+        order = np.arange(self.count, self.count + self.capacity) % self.capacity
+        return self.samples[order], self.frame_starts[order]
+
+    def percentiles(self, q=(50, 90, 99)):
+        # Rolling percentiles in milliseconds, per phase plus the whole frame
+        samples, _ = self.recent()
+        if not len(samples):
+            return {}
+        ms = samples * 1000.0
+        result = {name: dict(zip((f"p{p}" for p in q), np.percentile(ms[:, i], q).tolist()))
+                  for i, name in enumerate(self.phases)}
+        result["frame"] = dict(zip((f"p{p}" for p in q), np.percentile(ms.sum(axis=1), q).tolist()))
+        return result
+
+    def dump_chrome_trace(self, path):
+        # Load in chrome://tracing or Perfetto
+        samples, starts = self.recent()
+        events = []
+        for frame, (row, start) in enumerate(zip(samples, starts)):
+            ts = start * 1e6
+            for name, duration in zip(self.phases, row):
+                if duration > 0:
+                    events.append({"name": name, "ph": "X", "pid": 0, "tid": 0,
+                                   "ts": ts, "dur": duration * 1e6, "args": {"frame": frame}})
+                    ts += duration * 1e6
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def draw_overlay(self, surface, font):
+        # Text is only re-rendered every few frames
+        if not self.overlay or self.count % OVERLAY_REFRESH_FRAMES == 0:
+            lines = [f"{name:<10} p50 {p['p50']:6.2f}  p99 {p['p99']:6.2f} ms"
+                     for name, p in self.percentiles().items()]
+            self.overlay = [font.render(line, True, (255, 255, 255), (0, 0, 0)) for line in lines]
+        y = 4
+        for line in self.overlay:
+            surface.blit(line, (4, y))
+            y += line.get_height()
+
+
+class NullProfiler:
+    # Stand-in when profiling is off, every hook is an empty call
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,166 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from mario_env import MarioEnv, MarioVectorEnv
+
+
+def buffer_layout(obs_spec, num_envs):
+    # name -> (shape, dtype) of every array shared between the runner and its workers
+    layout = {}
+    if isinstance(obs_spec, dict):
+        for name, (shape, dtype) in obs_spec.items():
+            layout["obs_" + name] = ((num_envs,) + shape, dtype)
+    else:
+        shape, dtype = obs_spec
+        layout["obs"] = ((num_envs,) + shape, dtype)
+    layout["rewards"] = ((num_envs,), np.float32)
+    layout["terminated"] = ((num_envs,), bool)
+    layout["truncated"] = ((num_envs,), bool)
+    layout["actions"] = ((num_envs,), np.int64)
+    return layout
+
+
+def attach_arrays(layout, segments):
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=segments[name].buf)
+        for name, (shape, dtype) in layout.items()
+    }
+
+
+def observations_from(arrays, obs_spec):
+    if isinstance(obs_spec, dict):
+        return {name: arrays["obs_" + name] for name in obs_spec}
+    return arrays["obs"]
+
+
+def worker_main(conn, segment_names, layout, obs_spec, first, count, env_kwargs):
+    segments = {name: shared_memory.SharedMemory(name=shm_name) for name, shm_name in segment_names.items()}
+    arrays = {name: array[first:first + count] for name, array in attach_arrays(layout, segments).items()}
+
+    # The vector env writes straight into this worker's slice of the shared arrays
+    buffers = {
+        "observations": observations_from(arrays, obs_spec),
+        "rewards": arrays["rewards"],
+        "terminated": arrays["terminated"],
+        "truncated": arrays["truncated"],
+    }
+    venv = MarioVectorEnv(count, buffers=buffers, **env_kwargs)
+    actions = arrays["actions"]
+
+    while True:
+        command, arg = conn.recv()
+        if command == "step":
+            # Infos go back over the pipe, they carry final_observation after an auto-reset
+            conn.send(venv.step_into(actions))
+        elif command == "reset":
+            venv.reset_into(None if arg is None else arg + first)
+            conn.send(None)
+        elif command == "close":
+            break
+
+    venv.close()
+    del venv, buffers, arrays, actions
+    for segment in segments.values():
+        segment.close()
+    conn.close()
+
+
+class RolloutRunner:
+    # Spawns num_workers processes that each own envs_per_worker headless envs.
+    # Actions, observations, rewards and done flags live in shared memory, so a
+    # step only sends a short command per worker instead of pickling arrays.
+    def __init__(self, num_workers, envs_per_worker, start_method=None, **env_kwargs):
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.num_envs = num_workers * envs_per_worker
+        self.segments = {}
+        self.conns = []
+        self.workers = []
+        self.arrays = None
+
+        try:
+            self.start(envs_per_worker, start_method, env_kwargs)
+        except BaseException:
+            # Don't leave shared memory segments or workers behind
+            self.close()
+            raise
+
+    def start(self, envs_per_worker, start_method, env_kwargs):
+        # The spec needs a real env (pixel shapes depend on its kwargs), it is closed right away
+        probe = MarioEnv(**env_kwargs)
+        self.obs_spec = probe.obs_spec
+        probe.close()
+
+        self.layout = buffer_layout(self.obs_spec, self.num_envs)
+        for name, (shape, dtype) in self.layout.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            self.segments[name] = shared_memory.SharedMemory(create=True, size=size)
+        self.arrays = attach_arrays(self.layout, self.segments)
+
+        self.observations = observations_from(self.arrays, self.obs_spec)
+        self.rewards = self.arrays["rewards"]
+        self.terminated = self.arrays["terminated"]
+        self.truncated = self.arrays["truncated"]
+        self.actions = self.arrays["actions"]
+
+        ctx = mp.get_context(start_method)
+        segment_names = {name: segment.name for name, segment in self.segments.items()}
+        for w in range(self.num_workers):
+            parent_conn, child_conn = ctx.Pipe()
+            worker = ctx.Process(
+                target=worker_main,
+                args=(child_conn, segment_names, self.layout, self.obs_spec,
+                      w * envs_per_worker, envs_per_worker, env_kwargs),
+                daemon=True,
+            )
+            worker.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.workers.append(worker)
+
+    def broadcast(self, command, arg=None):
+        # Returns every worker's reply. A dead worker closes the runner
+        # (unlinking the shared memory) before the error is re-raised.
+        try:
+            for conn in self.conns:
+                conn.send((command, arg))
+            return [conn.recv() for conn in self.conns]
+        except (EOFError, OSError):
+            self.close()
+            raise
+
+    # The returned arrays are the shared buffers themselves, copy them if they
+    # need to survive the next step().
+    def reset(self, seed=None):
+        self.broadcast("reset", seed)
+        return self.observations
+
+    def step(self, actions):
+        # infos is one dict per env, in env order, like MarioVectorEnv.step()
+        self.actions[:] = actions
+        infos = [info for worker_infos in self.broadcast("step") for info in worker_infos]
+        return self.observations, self.rewards, self.terminated, self.truncated, infos
+
+    def close(self):
+        # Safe to call more than once and on a runner that failed half way
+        for conn in self.conns:
+            try:
+                conn.send(("close", None))
+            except OSError:
+                pass
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        for conn in self.conns:
+            conn.close()
+        self.conns = []
+        self.workers = []
+
+        self.observations = self.rewards = self.terminated = self.truncated = self.actions = None
+        self.arrays = None
+        for segment in self.segments.values():
+            segment.close()
+            segment.unlink()
+        self.segments = {}
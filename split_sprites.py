@@ -1,90 +1,115 @@
 from PIL import Image
+import json
 import os
+import sys
+import numpy as np
 
-# Load image
-im = Image.open("characters_sprites.gif").convert("RGBA")
-pixels = im.load()
-width, height = im.size
+# python split_sprites.py [--png]
+#   Splits the Mario sheet into frames and packs them, together with the enemy
+#   and tile sprites, into one atlas image + index. --png also writes the
+#   individual frame_N.png files like before.
 
+SHEET_NAME = "characters_sprites.gif"
 base_folder = "sprites"
 super_folder = os.path.join(base_folder, "super_mario")
 mario_folder = os.path.join(base_folder, "mario")
 
-os.makedirs(super_folder, exist_ok=True)
-os.makedirs(mario_folder, exist_ok=True)
-
-
-def row_has_pixels(y):
-    for x in range(width):
-        if pixels[x, y][3] > 0:
-            return True
-    return False
-
-
-# ---- Find first row ----
-y = 0
-while y < height and not row_has_pixels(y):
-    y += 1
-
-row1_top = y
-
-while y < height and row_has_pixels(y):
-    y += 1
-
-row1_bottom = y
-
-# ---- Skip gap ----
-while y < height and not row_has_pixels(y):
-    y += 1
-
-# ---- Find second row ----
-row2_top = y
-
-while y < height and row_has_pixels(y):
-    y += 1
-
-row2_bottom = y
-
-
-def extract_row(row_top, row_bottom, output_folder):
-    sprite_regions = []
-    in_sprite = False
-    start_x = 0
-
-    # Detect horizontal sprite bounds
-    for x in range(width):
-        column_has_pixel = False
-        for y in range(row_top, row_bottom):
-            if pixels[x, y][3] > 0:
-                column_has_pixel = True
-                break
-
-        if column_has_pixel and not in_sprite:
-            in_sprite = True
-            start_x = x
-
-        elif not column_has_pixel and in_sprite:
-            sprite_regions.append((start_x, x))
-            in_sprite = False
-
-    if in_sprite:
-        sprite_regions.append((start_x, width))
-
-    # Save sprites
-    for i, (start, end) in enumerate(sprite_regions):
-        left = max(start - 1, 0)
-        right = min(end + 1, width)
-
-        # Clamp padding strictly to row
-        top = max(row_top - 1, 0)
-        bottom = min(row_bottom + 1, height)
-
-        sprite = im.crop((left, top, right, bottom))
-        sprite.save(os.path.join(output_folder, f"frame_{i}.png"))
-
-    print(f"Saved {len(sprite_regions)} sprites to {output_folder}")
-
-
-# Extract rows
-extract_row(row1_top, row1_bottom, super_folder)
-extract_row(row2_top, row2_bottom, mario_folder)
+ATLAS_IMAGE = os.path.join(base_folder, "atlas.png")
+ATLAS_INDEX = os.path.join(base_folder, "atlas.json")
+ATLAS_WIDTH = 512
+PADDING = 1
+
+
+def find_runs(mask):
+    # [start, end) of every run of True values in a 1D mask
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def split_sheet(im):
+    # Alpha projections find the sprite rows, then the sprites inside each row
+    opaque = np.asarray(im)[:, :, 3] > 0
+    height, width = opaque.shape
+    rows = find_runs(opaque.any(axis=1))
+
+    sprite_rows = []
+    for row_top, row_bottom in rows[:2]:
+        sprites = []
+        for start, end in find_runs(opaque[row_top:row_bottom].any(axis=0)):
+            left = max(start - 1, 0)
+            right = min(end + 1, width)
+
+            # Clamp padding strictly to row
+            top = max(row_top - 1, 0)
+            bottom = min(row_bottom + 1, height)
+            sprites.append(im.crop((left, top, right, bottom)))
+        sprite_rows.append(sprites)
+    return sprite_rows
+
+
+def load_folder(folder, key_prefix):
+    images = []
+    for root, _, files in os.walk(folder):
+        for file in sorted(files):
+            if file.endswith((".png", ".gif")):
+                path = os.path.join(root, file)
+                key = os.path.relpath(path, base_folder).replace(os.sep, "/")
+                if key.startswith(key_prefix):
+                    images.append((key, Image.open(path).convert("RGBA")))
+    return images
+
+
+def pack(images):
+    # Shelf packing, tallest sprites first
+    order = sorted(images, key=lambda item: (-item[1].height, item[0]))
+    rects = {}
+    x = y = shelf_height = 0
+    for key, image in order:
+        w, h = image.size
+        if x + w > ATLAS_WIDTH:
+            x = 0
+            y += shelf_height + PADDING
+            shelf_height = 0
+        rects[key] = (x, y, w, h)
+        x += w + PADDING
+        shelf_height = max(shelf_height, h)
+
+    atlas = Image.new("RGBA", (ATLAS_WIDTH, y + shelf_height), (0, 0, 0, 0))
+    for key, image in images:
+        atlas.paste(image, rects[key][:2])
+    return atlas, rects
+
+
+def main():
+    write_png = "--png" in sys.argv[1:]
+    sheet_path = SHEET_NAME if os.path.exists(SHEET_NAME) else os.path.join(base_folder, SHEET_NAME)
+
+    images = []
+    if os.path.exists(sheet_path):
+        im = Image.open(sheet_path).convert("RGBA")
+        for sprites, output_folder in zip(split_sheet(im), (super_folder, mario_folder)):
+            prefix = os.path.basename(output_folder)
+            for i, sprite in enumerate(sprites):
+                images.append((f"{prefix}/frame_{i}.png", sprite))
+                if write_png:
+                    os.makedirs(output_folder, exist_ok=True)
+                    sprite.save(os.path.join(output_folder, f"frame_{i}.png"))
+            print(f"Split {len(sprites)} sprites for {output_folder}")
+    else:
+        # No sheet around, pack the frames that were split earlier
+        images += load_folder(super_folder, "super_mario/")
+        images += load_folder(mario_folder, "mario/")
+
+    images += load_folder(os.path.join(base_folder, "enemies"), "enemies/")
+    images += load_folder(os.path.join(base_folder, "tiles"), "tiles/")
+
+    atlas, rects = pack(images)
+    atlas.save(ATLAS_IMAGE)
+    with open(ATLAS_INDEX, "w") as f:
+        json.dump({"image": os.path.basename(ATLAS_IMAGE), "frames": rects}, f, sort_keys=True)
+    print(f"Packed {len(rects)} sprites into {ATLAS_IMAGE} ({atlas.width}x{atlas.height})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,32 @@
-import pygame
 import os
+from assets import asset_cache
+
+# Mario animations run on the same 60 ticks/s clock as the level's tiles,
+# each frame is shown for FRAME_TICKS ticks
+ANIMATION_TICK_RATE = 60
+FRAME_TICKS = 6
+DEFAULT_ANIMATION = "idle right"
+
 
 class SpriteManager:
+    # Shared, read-only frame store. Which frame an entity shows lives in its
+    # own Animator, so one manager can serve any number of entities.
     def __init__(self, base_folder, scale=1):
         self.frames = {}
         self.scale = scale
         self.mario_path = os.path.join(base_folder, "mario")
         self.frames["mario"] = []
+        self.frame_paths = []
 
-        # load all frames
-        if os.path.exists(self.mario_path):
-            files = [f for f in os.listdir(self.mario_path) if f.endswith(".png")]
-            files.sort(key=lambda x: int(x.split("_")[1].split(".")[0]))  # ensure order
+        # load all frames (subsurfaces of the sprite atlas when there is one)
+        paths = asset_cache.list_images(self.mario_path)
+        paths.sort(key=lambda x: int(os.path.basename(x).split("_")[1].split(".")[0]))  # ensure order
 
-            for file in files:
-                image = pygame.image.load(os.path.join(self.mario_path, file)).convert_alpha()
-                w, h = image.get_size()
-                image = pygame.transform.scale(image, (w * self.scale, h * self.scale))
-                self.frames["mario"].append(image)
+        for path in paths:
+            # scaled frames are shared with every other SpriteManager at this scale
+            image = asset_cache.acquire_image(path, self.scale)
+            self.frames["mario"].append(image)
+            self.frame_paths.append(path)
 
         # define animations using the **indices of the loaded frames**
         self.animations = {
@@ -30,25 +39,42 @@ class SpriteManager:
             "fall right": [18],
             "fall left": [11]
         }
+        # Animation name -> its frame surfaces, resolved once
+        self.animation_frames = {
+            name: [self.frames["mario"][idx] for idx in indices]
+            for name, indices in self.animations.items()
+        }
+
+    def get_frames(self, animation_type):
+        frames = self.animation_frames.get(animation_type)
+        return frames if frames is not None else self.animation_frames[DEFAULT_ANIMATION]
 
-        self.current_animation = None
-        self.frame_index = 0
-        self.timer = 0
-        self.animation_speed = 0.1
+    def close(self):
+        for path in self.frame_paths:
+            asset_cache.release_image(path, self.scale)
+        self.frame_paths = []
+
+
+class Animator:
+    # Per-entity animation state (which animation, which frame, time shown)
+    # on top of a shared SpriteManager. Every renderer of an entity keeps its
+    # own Animator, so drawing the same Mario twice doesn't speed him up.
+    def __init__(self, sprites):
+        self.sprites = sprites
+        self.animation = None
+        self.time = 0.0
+        self.start_tick = 0
 
     def get_frame(self, animation_type, dt):
+        # The frame is a lookup by ticks since the animation started, so
+        # uneven dt can't make it drift. The tiny epsilon keeps accumulated
+        # 1/60 steps from landing a tick early.
+        self.time += dt
+        tick = int(self.time * ANIMATION_TICK_RATE + 1e-6)
         # change animation type
-        if animation_type != self.current_animation:
-            self.current_animation = animation_type
-            self.frame_index = 0
-            self.timer = 0
-
-        frames = self.animations.get(animation_type, self.animations["idle right"])
-        self.timer += dt
-        if self.timer >= self.animation_speed:
-            self.timer = 0
-            self.frame_index = (self.frame_index + 1) % len(frames)
-
-        # frames list only has indices for self.frames["mario"]
-        idx = frames[self.frame_index]
-        return self.frames["mario"][idx]
+        if animation_type != self.animation:
+            self.animation = animation_type
+            self.start_tick = tick
+
+        frames = self.sprites.get_frames(animation_type)
+        return frames[(tick - self.start_tick) // FRAME_TICKS % len(frames)]
@@ -0,0 +1,44 @@
+import os
+import sys
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pygame
+from dirty_render import DirtyRenderer
+from mario_env import MarioEnv
+
+
+def test_pixel_episodes_keep_changed_cells_bounded():
+    env = MarioEnv(obs_type="pixels", max_steps=400)
+    level = env.game.level
+    rng = np.random.default_rng(0)
+    bumps = 0
+    for episode in range(12):
+        env.reset()
+        done = False
+        while not done:
+            _, _, terminated, truncated, _ = env.step(rng.choice([1, 2, 2, 3]))
+            done = terminated or truncated
+        bumps += len(level.edited_cells)
+        # Nothing consumes them without a dirty-rect renderer
+        assert level.changed_cells == []
+    assert bumps > 0
+    env.close()
+
+
+def test_dirty_renderer_sees_changed_cells():
+    env = MarioEnv(obs_type="pixels")
+    env.reset()
+    pygame.display.init()
+    renderer = DirtyRenderer(env.game, pygame.Surface((env.game.screen_width, env.game.screen_height)))
+    renderer.render(env.game.dt)
+    env.game.level.set_tile(5, 5, 0)
+    assert env.game.level.changed_cells == [(5, 5)]
+    renderer.render(env.game.dt)
+    assert env.game.level.changed_cells == []
+    env.close()